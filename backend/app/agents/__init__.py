@@ -1,4 +1,7 @@
 from .base_agent import BaseAgent, AgentOrchestrator
+from .prompt_builder import PromptBuilder
+from .gemini_agent import GeminiAgent
+from .crawl_result import CrawlResult
 from .firecrawl_agent import FirecrawlAgent
 from .analysis_agent import AnalysisAgent
 from .comparison_agent import ComparisonAgent
@@ -6,7 +9,10 @@ from .comparison_agent import ComparisonAgent
 __all__ = [
     "BaseAgent",
     "AgentOrchestrator",
+    "GeminiAgent",
+    "PromptBuilder",
     "FirecrawlAgent",
+    "CrawlResult",
     "AnalysisAgent",
     "ComparisonAgent"
 ]
\ No newline at end of file
@@ -1,19 +1,47 @@
-from .base_agent import BaseAgent
-import google.generativeai as genai
+from .gemini_agent import GeminiAgent
+from .crawl_result import CrawlResult
 from app.core.config import settings
-from typing import Dict, Any, List
+from app.core.metrics import LLM_PARSE_SECONDS
+from typing import Dict, Any, List, Optional
+import asyncio
+import contextlib
 import json
 
-class AnalysisAgent(BaseAgent):
+# JSON shape requested for every competitor analysis, indented to sit inside the prompt templates
+ANALYSIS_JSON_FORMAT = """{
+            "company_name": "string",
+            "industry": "string",
+            "company_size": "string (startup/small/medium/large/enterprise)",
+            "target_market": "string",
+            "strengths": ["list of key strengths"],
+            "weaknesses": ["list of potential weaknesses"],
+            "pricing_strategy": {
+                "model": "string (freemium/subscription/one-time/enterprise/custom)",
+                "positioning": "string (budget/mid-market/premium/luxury)",
+                "transparency": "string (transparent/hidden/complex)"
+            },
+            "market_position": "string (leader/challenger/follower/niche)",
+            "key_differentiators": ["list of unique value propositions"],
+            "growth_opportunities": ["list of potential growth areas"],
+            "market_gaps": ["list of market gaps this company could fill"],
+            "competitive_threats": ["list of potential threats"],
+            "business_model": "string",
+            "technology_stack": ["list of identified technologies"],
+            "marketing_strategy": "string",
+            "customer_focus": "string"
+        }"""
+
+ANALYSIS_REQUIRED_FIELDS = [
+    "company_name", "industry", "strengths", "weaknesses",
+    "pricing_strategy", "market_position", "key_differentiators",
+    "growth_opportunities", "market_gaps"
+]
+
+class AnalysisAgent(GeminiAgent):
     """Agent responsible for AI-powered competitor analysis using Gemini"""
 
     def __init__(self):
         super().__init__("analysis_agent")
-        if not settings.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is required")
-
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-pro')
 
     async def execute(self, **kwargs) -> Dict[str, Any]:
         """Execute comprehensive competitor analysis"""
@@ -23,57 +51,231 @@ class AnalysisAgent(BaseAgent):
 
         await self.log_execution(f"Starting analysis for {len(crawl_data)} competitors")
 
-        analysis_results = []
-        for data in crawl_data:
-            if not data.get("success"):
-                continue
+        successful_crawls = [data for data in crawl_data if data.success]
+        analysis_results = await self.analyze_crawls(successful_crawls, asyncio.Semaphore(settings.ANALYSIS_CONCURRENCY))
+
+        # Generate summary analysis unless the caller only needs per-competitor results
+        if kwargs.get("summarize", True):
+            summary = await self._generate_summary_analysis(analysis_results)
+        else:
+            summary = ""
 
+        return {
+            "competitor_analyses": analysis_results,
+            "summary": summary,
+            "total_analyzed": len([r for r in analysis_results if r["success"]])
+        }
+
+    async def analyze_crawls(self, data: List[CrawlResult], semaphore: Optional[asyncio.Semaphore] = None) -> List[Dict[str, Any]]:
+        """Analyze a group of crawl results in input order, packing small sites into shared prompts"""
+        successful_crawls = [item for item in data if item.success]
+
+        # Small sites are packed into shared prompts; larger ones get their own call
+        batches = self._plan_batches(successful_crawls)
+
+        # Analyze concurrently, then restore crawl order across batches
+        semaphore = semaphore or contextlib.nullcontext()
+        batch_results = await asyncio.gather(*(
+            self._analyze_batch_with_limit(batch, semaphore) for batch in batches
+        ))
+        results_by_crawl = {
+            id(item): result
+            for batch, results in zip(batches, batch_results)
+            for item, result in zip(batch, results)
+        }
+        return [
+            results_by_crawl[id(item)] if item.success else {"url": item.url, "error": item.error, "success": False}
+            for item in data
+        ]
+
+    async def summarize(
+        self,
+        analysis_results: Optional[List[Dict[str, Any]]] = None,
+        analysis_groups: Optional[List[List[Dict[str, Any]]]] = None
+    ) -> str:
+        """Generate the cross-competitor summary for completed analyses, given flat or as analyze_crawls groups"""
+        results = list(analysis_results or [])
+        for group in analysis_groups or []:
+            results.extend(group)
+        return await self._generate_summary_analysis(results)
+
+    async def _analyze_with_limit(self, data: CrawlResult, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Analyze one crawled competitor while holding a concurrency slot"""
+        async with semaphore:
             try:
                 analysis = await self._analyze_single_competitor(data)
-                analysis_results.append({
-                    "url": data["url"],
+                await self.log_execution(f"Completed analysis for {data.url}")
+                return {
+                    "url": data.url,
                     "analysis": analysis,
                     "success": True
-                })
-                await self.log_execution(f"Completed analysis for {data['url']}")
+                }
             except Exception as e:
-                analysis_results.append({
-                    "url": data["url"],
+                await self.log_execution(f"Failed analysis for {data.url}: {str(e)}")
+                return {
+                    "url": data.url,
                     "error": str(e),
                     "success": False
+                }
+
+    def _plan_batches(self, crawl_data: List[CrawlResult]) -> List[List[CrawlResult]]:
+        """Group small sites into multi-competitor batches; everything else stays single"""
+        batch_size = settings.ANALYSIS_BATCH_SIZE
+        if batch_size <= 1:
+            return [[data] for data in crawl_data]
+
+        batches = []
+        small_sites = []
+        for data in crawl_data:
+            if self.is_batchable(data):
+                small_sites.append(data)
+            else:
+                batches.append([data])
+
+        batches.extend(small_sites[i:i + batch_size] for i in range(0, len(small_sites), batch_size))
+        return batches
+
+    def is_batchable(self, data: CrawlResult) -> bool:
+        """Whether a crawled site is small enough to share a prompt with other competitors"""
+        if settings.ANALYSIS_BATCH_SIZE <= 1 or not data.success:
+            return False
+        selected = self.prompt_builder.select_content(
+            data.content, data.structured_data, settings.ANALYSIS_CONTENT_TOKEN_BUDGET
+        )
+        return self.prompt_builder.estimate_tokens(selected) <= settings.ANALYSIS_BATCH_CONTENT_TOKEN_BUDGET
+
+    async def _analyze_batch_with_limit(self, batch: List[CrawlResult], semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+        """Analyze several small competitors in one Gemini call, falling back to single calls"""
+        if len(batch) == 1:
+            return [await self._analyze_with_limit(batch[0], semaphore)]
+
+        try:
+            async with semaphore:
+                analyses = await self._analyze_competitor_batch(batch)
+        except Exception as e:
+            await self.log_execution(f"Batch analysis failed, falling back to single calls: {str(e)}")
+            analyses = {}
+
+        # Competitors missing from the batched response are retried individually
+        fallbacks = await asyncio.gather(*(
+            self._analyze_with_limit(data, semaphore)
+            for data in batch if data.url not in analyses
+        ))
+        fallback_results = iter(fallbacks)
+
+        results = []
+        for data in batch:
+            if data.url in analyses:
+                await self.log_execution(f"Completed analysis for {data.url}")
+                results.append({
+                    "url": data.url,
+                    "analysis": analyses[data.url],
+                    "success": True
                 })
-                await self.log_execution(f"Failed analysis for {data['url']}: {str(e)}")
+            else:
+                results.append(next(fallback_results))
+        return results
+
+    async def _analyze_competitor_batch(self, batch: List[CrawlResult]) -> Dict[str, Dict[str, Any]]:
+        """Request analyses for a batch of competitors as a JSON array keyed by URL"""
+        batch_prompt = self._build_batch_analysis_prompt(batch)
+
+        cache_key = self._prompt_cache_key(batch_prompt)
+        cached = await self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+        response_text = await self._generate(batch_prompt)
+        with LLM_PARSE_SECONDS.time(agent=self.name):
+            analyses = self._parse_batch_analysis_response(response_text, [data.url for data in batch])
+
+        # Only cache complete batches; partial ones are finished by single calls
+        if len(analyses) == len(batch):
+            await self._cache_response(cache_key, analyses)
+        return analyses
+
+    def _build_batch_analysis_prompt(self, batch: List[CrawlResult]) -> str:
+        """Build one prompt covering several competitors' trimmed content"""
+        sections = []
+        for number, data in enumerate(batch, start=1):
+            website_content = self.prompt_builder.select_content(
+                data.content, data.structured_data, settings.ANALYSIS_BATCH_CONTENT_TOKEN_BUDGET
+            )
+            sections.append(f"""
+        COMPETITOR {number}:
+        Company URL: {data.url}
+        Company Title: {data.structured_data.get('title', 'N/A')}
+        Company Description: {data.structured_data.get('description', 'N/A')}
+        Website Content:
+        {website_content}
+        """)
+        competitors = "".join(sections)
 
-        # Generate summary analysis
-        summary = await self._generate_summary_analysis(analysis_results)
+        prompt = f"""
+        Analyze each of the following {len(batch)} competitor companies and provide a business intelligence report for each one.
+        {competitors}
+        Respond with a JSON array containing exactly one object per competitor, in the same order.
+        Each object must include a "url" field with the competitor's Company URL exactly as given above,
+        plus the following fields:
+        {ANALYSIS_JSON_FORMAT}
+
+        Important: Respond ONLY with a valid JSON array. Do not include any explanatory text before or after the JSON.
+        """
+        return prompt
 
-        return {
-            "competitor_analyses": analysis_results,
-            "summary": summary,
-            "total_analyzed": len([r for r in analysis_results if r["success"]])
-        }
+    def _parse_batch_analysis_response(self, response_text: str, urls: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Parse a batched response into analyses keyed by URL, skipping unusable entries"""
+        try:
+            items = json.loads(self._strip_code_fence(response_text))
+        except json.JSONDecodeError:
+            return {}
+
+        if not isinstance(items, list):
+            return {}
 
-    async def _analyze_single_competitor(self, crawl_data: Dict[str, Any]) -> Dict[str, Any]:
+        analyses = {}
+        for item in items:
+            if isinstance(item, dict) and item.get("url") in urls:
+                url = item.pop("url")
+                analyses[url] = self._fill_required_fields(item)
+        return analyses
+
+    async def _analyze_single_competitor(self, crawl_data: CrawlResult) -> Dict[str, Any]:
         """Analyze a single competitor using Gemini AI"""
-        url = crawl_data["url"]
-        content = crawl_data["data"]["content"]
-        structured_data = crawl_data["data"]["structured_data"]
+        url = crawl_data.url
+        content = crawl_data.content
+        structured_data = crawl_data.structured_data
 
         analysis_prompt = self._build_analysis_prompt(url, content, structured_data)
 
+        cache_key = self._prompt_cache_key(analysis_prompt)
+        cached = await self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            response = self.model.generate_content(analysis_prompt)
-            analysis_text = response.text
+            analysis_text = await self._generate(analysis_prompt)
 
             # Parse the structured response
-            analysis = self._parse_analysis_response(analysis_text)
-            return analysis
-
+            with LLM_PARSE_SECONDS.time(agent=self.name):
+                analysis = self._parse_analysis_response(analysis_text)
         except Exception as e:
             raise Exception(f"Gemini AI error for {url}: {str(e)}")
 
+        # Parse fallbacks carry an error and should be retried next time
+        if "error" not in analysis:
+            await self._cache_response(cache_key, analysis)
+        return analysis
+
     def _build_analysis_prompt(self, url: str, content: str, structured_data: Dict[str, Any]) -> str:
         """Build a comprehensive analysis prompt for Gemini"""
+        website_content = self.prompt_builder.select_content(
+            content, structured_data, settings.ANALYSIS_CONTENT_TOKEN_BUDGET
+        )
+        structured_json = self.prompt_builder.compact_structured_data(
+            structured_data, settings.ANALYSIS_STRUCTURED_TOKEN_BUDGET
+        )
+
         prompt = f"""
         Analyze the following competitor company and provide a comprehensive business intelligence report.
 
@@ -82,34 +284,13 @@ class AnalysisAgent(BaseAgent):
         Company Description: {structured_data.get('description', 'N/A')}
 
         Website Content:
-        {content[:4000]}  # Limit content to avoid token limits
+        {website_content}
 
         Structured Data:
-        {json.dumps(structured_data, indent=2)[:2000]}
+        {structured_json}
 
         Please provide a detailed analysis in the following JSON format:
-        {{
-            "company_name": "string",
-            "industry": "string",
-            "company_size": "string (startup/small/medium/large/enterprise)",
-            "target_market": "string",
-            "strengths": ["list of key strengths"],
-            "weaknesses": ["list of potential weaknesses"],
-            "pricing_strategy": {{
-                "model": "string (freemium/subscription/one-time/enterprise/custom)",
-                "positioning": "string (budget/mid-market/premium/luxury)",
-                "transparency": "string (transparent/hidden/complex)"
-            }},
-            "market_position": "string (leader/challenger/follower/niche)",
-            "key_differentiators": ["list of unique value propositions"],
-            "growth_opportunities": ["list of potential growth areas"],
-            "market_gaps": ["list of market gaps this company could fill"],
-            "competitive_threats": ["list of potential threats"],
-            "business_model": "string",
-            "technology_stack": ["list of identified technologies"],
-            "marketing_strategy": "string",
-            "customer_focus": "string"
-        }}
+        {ANALYSIS_JSON_FORMAT}
 
         Important: Respond ONLY with valid JSON. Do not include any explanatory text before or after the JSON.
         """
@@ -118,27 +299,8 @@ class AnalysisAgent(BaseAgent):
     def _parse_analysis_response(self, response_text: str) -> Dict[str, Any]:
         """Parse the AI response into structured data"""
         try:
-            # Clean the response text
-            response_text = response_text.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-
-            analysis = json.loads(response_text.strip())
-
-            # Validate required fields
-            required_fields = [
-                "company_name", "industry", "strengths", "weaknesses",
-                "pricing_strategy", "market_position", "key_differentiators",
-                "growth_opportunities", "market_gaps"
-            ]
-
-            for field in required_fields:
-                if field not in analysis:
-                    analysis[field] = "Not available"
-
-            return analysis
+            analysis = json.loads(self._strip_code_fence(response_text))
+            return self._fill_required_fields(analysis)
 
         except json.JSONDecodeError as e:
             # Fallback: create a basic analysis structure
@@ -155,20 +317,54 @@ class AnalysisAgent(BaseAgent):
                 "error": f"Failed to parse AI response: {str(e)}"
             }
 
+    def _strip_code_fence(self, response_text: str) -> str:
+        """Remove the markdown code fence Gemini sometimes wraps JSON in"""
+        response_text = response_text.strip()
+        if response_text.startswith("```json"):
+            response_text = response_text[7:]
+        if response_text.endswith("```"):
+            response_text = response_text[:-3]
+        return response_text.strip()
+
+    def _fill_required_fields(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate required fields, defaulting any that are missing"""
+        for field in ANALYSIS_REQUIRED_FIELDS:
+            if field not in analysis:
+                analysis[field] = "Not available"
+        return analysis
+
     async def _generate_summary_analysis(self, analysis_results: List[Dict[str, Any]]) -> str:
-        """Generate a summary analysis across all competitors"""
+        """Generate a summary analysis across all competitors using a map-reduce over digests"""
         successful_analyses = [r for r in analysis_results if r["success"]]
 
         if not successful_analyses:
             return "No successful analyses to summarize."
 
+        try:
+            # Map: condense every analysis into a bounded-size digest
+            notes = [self._digest_analysis(r["url"], r["analysis"]) for r in successful_analyses]
+
+            # Reduce: merge digests in bounded groups, in parallel, until one prompt's worth remains
+            group_size = max(2, settings.SUMMARY_GROUP_SIZE)
+            semaphore = asyncio.Semaphore(settings.ANALYSIS_CONCURRENCY)
+            while len(notes) > group_size:
+                groups = [notes[i:i + group_size] for i in range(0, len(notes), group_size)]
+                notes = await asyncio.gather(*(
+                    self._reduce_digest_group(group, semaphore) for group in groups
+                ))
+                await self.log_execution(f"Reduced competitor digests to {len(notes)} group briefs")
+        except Exception as e:
+            return f"Failed to generate summary analysis: {str(e)}"
+
+        competitor_data = "\n\n".join(notes)
+
         summary_prompt = f"""
         Based on the following competitor analyses, provide a strategic market overview and insights.
 
         Number of competitors analyzed: {len(successful_analyses)}
 
         Competitor Data:
-        {json.dumps([r["analysis"] for r in successful_analyses], indent=2)[:3000]}
+        {competitor_data}
 
         Please provide a strategic summary covering:
         1. Market landscape overview
@@ -181,8 +377,61 @@ class AnalysisAgent(BaseAgent):
         Keep the summary concise but insightful (300-500 words).
         """
 
+        cache_key = self._prompt_cache_key(summary_prompt)
+        cached = await self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            response = self.model.generate_content(summary_prompt)
-            return response.text
+            summary = await self._generate(summary_prompt)
         except Exception as e:
-            return f"Failed to generate summary analysis: {str(e)}"
\ No newline at end of file
+            return f"Failed to generate summary analysis: {str(e)}"
+
+        await self._cache_response(cache_key, summary)
+        return summary
+
+    def _digest_analysis(self, url: str, analysis: Dict[str, Any]) -> str:
+        """Condense one competitor analysis into compact JSON within the digest token budget"""
+        pricing = analysis.get("pricing_strategy")
+        digest = {
+            "company": analysis.get("company_name", "Unknown"),
+            "url": url,
+            "industry": analysis.get("industry"),
+            "position": analysis.get("market_position"),
+            "pricing": pricing if isinstance(pricing, dict) else None,
+            "strengths": self._as_list(analysis.get("strengths"))[:3],
+            "weaknesses": self._as_list(analysis.get("weaknesses"))[:3],
+            "differentiators": self._as_list(analysis.get("key_differentiators"))[:3],
+            "market_gaps": self._as_list(analysis.get("market_gaps"))[:3]
+        }
+        return self.prompt_builder.compact_structured_data(digest, settings.SUMMARY_DIGEST_TOKEN_BUDGET)
+
+    def _as_list(self, value: Any) -> List[Any]:
+        """Normalize analysis fields that fall back to a string when missing"""
+        return value if isinstance(value, list) else []
+
+    async def _reduce_digest_group(self, notes: List[str], semaphore: asyncio.Semaphore) -> str:
+        """Merge a group of competitor digests or briefs into one segment brief"""
+        joined_notes = "\n\n".join(notes)
+        reduce_prompt = f"""
+        Condense the following competitor notes into a single market segment brief.
+
+        Competitor Notes:
+        {joined_notes}
+
+        Cover the companies included, shared strengths, shared weaknesses and market gaps,
+        pricing patterns, and notable differentiators. Name companies where relevant.
+
+        Keep the brief under 200 words and do not invent information that is not in the notes.
+        """
+
+        cache_key = self._prompt_cache_key(reduce_prompt)
+        cached = await self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+        async with semaphore:
+            brief = await self._generate(reduce_prompt)
+
+        await self._cache_response(cache_key, brief)
+        return brief
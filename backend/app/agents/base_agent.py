@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from app.core.config import settings
+from app.core.deadline import time_remaining
+from app.core.metrics import AGENT_EXECUTE_SECONDS, AGENT_EXECUTE_ERRORS, AGENT_STEP_SECONDS, AGENT_STEP_ERRORS
+from typing import Dict, Any, List, Optional
 import asyncio
+import functools
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -9,6 +13,13 @@ logger = logging.getLogger(__name__)
 class BaseAgent(ABC):
     """Base class for all AI agents in the system"""
 
+    def __init_subclass__(cls, **kwargs):
+        """Wrap every concrete execute in a timing span so agents are instrumented without opting in"""
+        super().__init_subclass__(**kwargs)
+        execute = cls.__dict__.get("execute")
+        if execute is not None and not getattr(execute, "__isabstractmethod__", False):
+            cls.execute = _instrument_execute(execute)
+
     def __init__(self, name: str):
         self.name = name
         self.logger = logging.getLogger(f"agent.{name}")
@@ -22,6 +33,19 @@ class BaseAgent(ABC):
         """Log agent execution details"""
         self.logger.info(f"Agent {self.name}: {action}", extra=data or {})
 
+def _instrument_execute(execute):
+    """Record latency and errors of an agent's execute under the agent's name"""
+    @functools.wraps(execute)
+    async def wrapper(self, *args, **kwargs) -> Dict[str, Any]:
+        with AGENT_EXECUTE_SECONDS.time(agent=self.name):
+            try:
+                return await execute(self, *args, **kwargs)
+            except Exception:
+                AGENT_EXECUTE_ERRORS.inc(agent=self.name)
+                raise
+
+    return wrapper
+
 class AgentOrchestrator:
     """Orchestrates multiple agents working together"""
 
@@ -34,35 +58,132 @@ class AgentOrchestrator:
         self.agents[agent.name] = agent
         self.logger.info(f"Registered agent: {agent.name}")
 
-    async def execute_workflow(self, workflow: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Execute a series of agent tasks in sequence or parallel"""
-        results = {}
-
-        for step in workflow:
-            agent_name = step.get("agent")
-            action = step.get("action", "execute")
-            params = step.get("params", {})
-            parallel = step.get("parallel", False)
-
-            if agent_name not in self.agents:
-                raise ValueError(f"Agent {agent_name} not registered")
-
-            agent = self.agents[agent_name]
-
+    async def execute_workflow(self, workflow: List[Dict[str, Any]], limits: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """Execute workflow steps as a dependency graph, running each step as soon as its inputs are ready
+
+        Each step is a dict with:
+            agent: name of a registered agent
+            id: unique step id, defaulting to the agent name; results are keyed by it
+            method: agent coroutine to call, defaulting to "execute"
+            action: label used in logs, defaulting to the method name
+            params: static keyword arguments
+            inputs: keyword argument -> step id (that step's result) or list of step ids (their results)
+            after: extra step ids that must finish first without passing data
+            limit: name of a concurrency limit in `limits` shared by every step that uses it
+
+        Independent steps run concurrently. A step that raises records {"error": ...} and its
+        dependents are skipped with an error result instead of running. When the current request
+        deadline passes, running steps get WORKFLOW_DEADLINE_GRACE seconds to unwind, since provider
+        calls already give up at the deadline and agents turn that into per-item failures while keeping
+        finished results; steps still running after that are cancelled and record {"error": "Deadline exceeded"}.
+        """
+        steps = self._index_steps(workflow)
+        order = self._topological_order(steps)
+        semaphores = {name: asyncio.Semaphore(max(1, size)) for name, size in (limits or {}).items()}
+
+        results: Dict[str, Any] = {}
+        failed = set()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_step(step_id: str):
+            step = steps[step_id]
+            dependencies = self._dependencies(step)
+            await asyncio.gather(*(tasks[dependency] for dependency in dependencies))
+
+            failed_dependencies = [dependency for dependency in dependencies if dependency in failed]
+            if failed_dependencies:
+                failed.add(step_id)
+                results[step_id] = {"error": f"Skipped because {', '.join(failed_dependencies)} failed"}
+                return
+
+            agent = self.agents[step["agent"]]
+            method = step.get("method", "execute")
+            action = step.get("action", method)
+            params = dict(step.get("params", {}))
+            for name, source in step.get("inputs", {}).items():
+                params[name] = [results[item] for item in source] if isinstance(source, list) else results[source]
+
+            limit = step.get("limit")
             try:
-                self.logger.info(f"Executing {action} on agent {agent_name}")
-                if parallel:
-                    # For parallel execution, we'd need to modify this
-                    # For now, executing sequentially
-                    result = await agent.execute(**params)
+                self.logger.info(f"Executing {action} on agent {step['agent']} ({step_id})")
+                if limit:
+                    async with semaphores[limit]:
+                        result = await self._timed_call(agent, method, params)
                 else:
-                    result = await agent.execute(**params)
+                    result = await self._timed_call(agent, method, params)
 
-                results[agent_name] = result
-                await agent.log_execution(f"Completed {action}", {"result_keys": list(result.keys())})
+                results[step_id] = result
+                await agent.log_execution(f"Completed {action}", {"step": step_id})
 
             except Exception as e:
-                self.logger.error(f"Error executing {action} on agent {agent_name}: {str(e)}")
-                results[agent_name] = {"error": str(e)}
-
-        return results
\ No newline at end of file
+                self.logger.error(f"Error executing {action} on agent {step['agent']} ({step_id}): {str(e)}")
+                AGENT_STEP_ERRORS.inc(agent=step["agent"], method=method)
+                failed.add(step_id)
+                results[step_id] = {"error": str(e)}
+
+        # Dependencies are scheduled before their dependents so every awaited task exists
+        for step_id in order:
+            tasks[step_id] = asyncio.ensure_future(run_step(step_id))
+
+        try:
+            if tasks:
+                _, pending = await asyncio.wait(tasks.values(), timeout=time_remaining())
+                if pending:
+                    await asyncio.wait(pending, timeout=settings.WORKFLOW_DEADLINE_GRACE)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        for step_id in steps:
+            if step_id not in results:
+                self.logger.warning(f"Step {step_id} cancelled at the request deadline")
+                results[step_id] = {"error": "Deadline exceeded"}
+
+        return {step_id: results[step_id] for step_id in steps}
+
+    async def _timed_call(self, agent: BaseAgent, method: str, params: Dict[str, Any]) -> Any:
+        """Call an agent method inside a span labelled by agent and method; time waiting for a limit is excluded"""
+        with AGENT_STEP_SECONDS.time(agent=agent.name, method=method):
+            return await getattr(agent, method)(**params)
+
+    def _index_steps(self, workflow: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Key steps by id and check agents and dependencies exist"""
+        steps: Dict[str, Dict[str, Any]] = {}
+        for step in workflow:
+            step_id = step.get("id", step.get("agent"))
+            if step_id in steps:
+                raise ValueError(f"Duplicate workflow step: {step_id}")
+            if step.get("agent") not in self.agents:
+                raise ValueError(f"Agent {step.get('agent')} not registered")
+            steps[step_id] = step
+
+        for step_id, step in steps.items():
+            for dependency in self._dependencies(step):
+                if dependency not in steps:
+                    raise ValueError(f"Step {step_id} depends on unknown step {dependency}")
+
+        return steps
+
+    def _dependencies(self, step: Dict[str, Any]) -> List[str]:
+        """Step ids a step reads from or must wait for"""
+        dependencies = list(step.get("after", []))
+        for source in step.get("inputs", {}).values():
+            dependencies.extend(source if isinstance(source, list) else [source])
+        return list(dict.fromkeys(dependencies))
+
+    def _topological_order(self, steps: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Order step ids so dependencies come first, rejecting cycles"""
+        remaining = {step_id: set(self._dependencies(step)) for step_id, step in steps.items()}
+        order = []
+
+        while remaining:
+            ready = [step_id for step_id, dependencies in remaining.items() if not dependencies]
+            if not ready:
+                raise ValueError(f"Workflow has a dependency cycle between: {', '.join(remaining)}")
+            for step_id in ready:
+                order.append(step_id)
+                del remaining[step_id]
+            for dependencies in remaining.values():
+                dependencies.difference_update(ready)
+
+        return order
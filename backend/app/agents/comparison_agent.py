@@ -1,19 +1,15 @@
-from .base_agent import BaseAgent
-import google.generativeai as genai
+from .gemini_agent import GeminiAgent
+from .crawl_result import CrawlResult
 from app.core.config import settings
+from app.core.metrics import LLM_PARSE_SECONDS
 from typing import Dict, Any, List
 import json
 
-class ComparisonAgent(BaseAgent):
+class ComparisonAgent(GeminiAgent):
     """Agent responsible for side-by-side competitor comparisons"""
 
     def __init__(self):
         super().__init__("comparison_agent")
-        if not settings.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is required")
-
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-pro')
 
     async def execute(self, **kwargs) -> Dict[str, Any]:
         """Execute side-by-side competitor comparison"""
@@ -23,7 +19,7 @@ class ComparisonAgent(BaseAgent):
         if not company_a_data or not company_b_data:
             raise ValueError("Both company data sets are required for comparison")
 
-        await self.log_execution(f"Comparing {company_a_data.get('url')} vs {company_b_data.get('url')}")
+        await self.log_execution(f"Comparing {company_a_data.url} vs {company_b_data.url}")
 
         try:
             comparison = await self._generate_comparison(company_a_data, company_b_data)
@@ -38,43 +34,55 @@ class ComparisonAgent(BaseAgent):
                 "success": False
             }
 
-    async def _generate_comparison(self, company_a_data: Dict[str, Any], company_b_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _generate_comparison(self, company_a_data: CrawlResult, company_b_data: CrawlResult) -> Dict[str, Any]:
         """Generate comprehensive comparison between two companies"""
 
         comparison_prompt = self._build_comparison_prompt(company_a_data, company_b_data)
 
+        cache_key = self._prompt_cache_key(comparison_prompt)
+        cached = await self._get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
         try:
-            response = self.model.generate_content(comparison_prompt)
-            comparison_text = response.text
+            comparison_text = await self._generate(comparison_prompt)
 
             # Parse the structured response
-            comparison = self._parse_comparison_response(comparison_text)
-            return comparison
-
+            with LLM_PARSE_SECONDS.time(agent=self.name):
+                comparison = self._parse_comparison_response(comparison_text)
         except Exception as e:
             raise Exception(f"Gemini AI comparison error: {str(e)}")
 
-    def _build_comparison_prompt(self, company_a_data: Dict[str, Any], company_b_data: Dict[str, Any]) -> str:
+        # Parse fallbacks carry an error and should be retried next time
+        if "error" not in comparison:
+            await self._cache_response(cache_key, comparison)
+        return comparison
+
+    def _build_comparison_prompt(self, company_a_data: CrawlResult, company_b_data: CrawlResult) -> str:
         """Build a comprehensive comparison prompt"""
 
         # Extract relevant data
-        company_a_content = company_a_data.get("data", {}).get("content", "")[:2000]
-        company_b_content = company_b_data.get("data", {}).get("content", "")[:2000]
+        company_a_structured = company_a_data.structured_data
+        company_b_structured = company_b_data.structured_data
 
-        company_a_structured = company_a_data.get("data", {}).get("structured_data", {})
-        company_b_structured = company_b_data.get("data", {}).get("structured_data", {})
+        company_a_content = self.prompt_builder.select_content(
+            company_a_data.content, company_a_structured, settings.COMPARISON_CONTENT_TOKEN_BUDGET
+        )
+        company_b_content = self.prompt_builder.select_content(
+            company_b_data.content, company_b_structured, settings.COMPARISON_CONTENT_TOKEN_BUDGET
+        )
 
         prompt = f"""
         Compare the following two companies and provide a detailed side-by-side analysis.
 
         COMPANY A:
-        URL: {company_a_data.get('url')}
+        URL: {company_a_data.url}
         Title: {company_a_structured.get('title', 'N/A')}
         Description: {company_a_structured.get('description', 'N/A')}
         Content: {company_a_content}
 
         COMPANY B:
-        URL: {company_b_data.get('url')}
+        URL: {company_b_data.url}
         Title: {company_b_structured.get('title', 'N/A')}
         Description: {company_b_structured.get('description', 'N/A')}
         Content: {company_b_content}
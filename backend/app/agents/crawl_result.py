@@ -0,0 +1,13 @@
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
+
+@dataclass(slots=True)
+class CrawlResult:
+    """Compact result of crawling a single URL; html is only kept when requested"""
+    url: str
+    success: bool
+    content: str = ""
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    structured_data: Dict[str, Any] = field(default_factory=dict)
+    html: Optional[str] = None
+    error: Optional[str] = None
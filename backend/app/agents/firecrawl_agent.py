@@ -1,8 +1,50 @@
 from .base_agent import BaseAgent
+from .crawl_result import CrawlResult
 from firecrawl import FirecrawlApp
 from app.core.config import settings
-from typing import Dict, Any, List
+from app.core.cache import PersistentCache
+from app.core.deadline import within_deadline
+from app.core.resilience import call_with_resilience, run_provider_call
+from app.core.metrics import CRAWL_BYTES
+from typing import Dict, Any, AsyncIterator, List, Set, Optional, Sequence
+from contextlib import asynccontextmanager
 import asyncio
+from bisect import bisect_right
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# Parameters sent to Firecrawl for every scrape; part of the crawl cache key
+SCRAPE_PARAMS = {
+    "includeTags": ["title", "meta", "h1", "h2", "h3", "p", "div"],
+    "onlyMainContent": True,
+    "waitFor": 3000
+}
+
+# Markdown feeds structured extraction and the prompts, so it is always requested
+REQUIRED_FORMATS = ["markdown"]
+
+# Keywords that mark a content line as relevant to a structured data section
+SECTION_KEYWORDS = {
+    "about": ["about us", "about", "company"],
+    "industry": ["industry", "sector"],
+    "founded": ["founded", "established"],
+    "products": ["products", "services", "solutions", "offerings"],
+    "pricing": ["pricing", "price", "cost", "$", "€", "£"],
+    "subscription": ["subscription", "monthly"],
+    "one_time": ["one-time", "purchase"],
+    "freemium": ["freemium", "free trial"],
+    "email": ["@"],
+    "phone": ["phone", "tel", "call"],
+    "address": ["address", "location"]
+}
+
+KEYWORD_CATEGORIES = {
+    keyword: category
+    for category, keywords in SECTION_KEYWORDS.items()
+    for keyword in keywords
+}
+
+# Query parameters that never change page content
+TRACKING_PARAMS = {"gclid", "fbclid", "ref"}
 
 class FirecrawlAgent(BaseAgent):
     """Agent responsible for web crawling and data extraction using Firecrawl"""
@@ -13,154 +55,248 @@ class FirecrawlAgent(BaseAgent):
             raise ValueError("FIRECRAWL_API_KEY is required")
         self.client = FirecrawlApp(api_key=settings.FIRECRAWL_API_KEY)
 
+        # Concurrency limits for crawl fan-out
+        self._crawl_semaphore = asyncio.Semaphore(settings.CRAWL_CONCURRENCY)
+        # Per-host semaphores only live while a crawl holds or waits for them
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._host_users: Dict[str, int] = {}
+
+        if settings.CRAWL_CACHE_ENABLED:
+            self.cache = PersistentCache(
+                namespace="crawl",
+                ttl=settings.CRAWL_CACHE_TTL,
+                max_bytes=settings.CRAWL_CACHE_MAX_BYTES
+            )
+        else:
+            self.cache = None
+
     async def execute(self, **kwargs) -> Dict[str, Any]:
         """Execute web crawling for competitor websites"""
         urls = kwargs.get("urls", [])
+        bypass_cache = kwargs.get("bypass_cache", False)
+        formats = kwargs.get("formats", settings.CRAWL_FORMATS)
         if not urls:
             raise ValueError("URLs are required for crawling")
 
         await self.log_execution(f"Starting crawl for {len(urls)} URLs")
 
-        results = []
-        for url in urls:
-            try:
-                # Use asyncio to make the synchronous call non-blocking
-                crawl_result = await asyncio.get_event_loop().run_in_executor(
-                    None, self._crawl_single_url, url
-                )
-                results.append({
-                    "url": url,
-                    "success": True,
-                    "data": crawl_result
-                })
-                await self.log_execution(f"Successfully crawled {url}")
-            except Exception as e:
-                results.append({
-                    "url": url,
-                    "success": False,
-                    "error": str(e)
-                })
-                await self.log_execution(f"Failed to crawl {url}: {str(e)}")
+        # Crawl concurrently; gather preserves the input order of the URLs
+        results = await asyncio.gather(*(self._crawl_with_limits(url, formats, bypass_cache) for url in urls))
 
         return {
             "crawl_results": results,
             "total_urls": len(urls),
-            "successful_crawls": len([r for r in results if r["success"]])
+            "successful_crawls": len([r for r in results if r.success])
         }
 
-    def _crawl_single_url(self, url: str) -> Dict[str, Any]:
-        """Crawl a single URL using Firecrawl"""
+    async def crawl_url(self, url: str, formats: Optional[Sequence[str]] = None, bypass_cache: bool = False) -> CrawlResult:
+        """Crawl a single URL under the shared concurrency limits"""
+        return await self._crawl_with_limits(url, formats or settings.CRAWL_FORMATS, bypass_cache)
+
+    async def _crawl_with_limits(self, url: str, formats: Sequence[str], bypass_cache: bool = False) -> CrawlResult:
+        """Crawl a URL under the global and per-host concurrency limits, answering cache hits without waiting for a slot"""
+        params = dict(SCRAPE_PARAMS, formats=REQUIRED_FORMATS + sorted(set(formats) - set(REQUIRED_FORMATS)))
+
+        cache_key = None
+        if self.cache:
+            cache_key = PersistentCache.make_key(self._canonicalize_url(url), params)
+            if not bypass_cache:
+                cached = await self._get_cached_crawl(url, cache_key)
+                if cached is not None:
+                    return CrawlResult(url=url, success=True, **cached)
+
+        # Wait for the host slot first so crawls queued behind a busy host do not hold global slots
+        async with self._host_slot(url), self._crawl_semaphore:
+            try:
+                # Run the synchronous scrape on the provider executor; past the request deadline we
+                # stop waiting, and the thread skips retries and rate-limit waits it no longer has time for
+                crawl_data = await within_deadline(run_provider_call(
+                    self._crawl_single_url, url, params, cache_key
+                ))
+                await self.log_execution(f"Successfully crawled {url}")
+                return CrawlResult(url=url, success=True, **crawl_data)
+            except Exception as e:
+                await self.log_execution(f"Failed to crawl {url}: {str(e)}")
+                return CrawlResult(url=url, success=False, error=str(e))
+
+    async def _get_cached_crawl(self, url: str, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Look up a previous crawl of the URL with the same scrape parameters"""
+        try:
+            cached = await self.cache.aget(cache_key)
+        except Exception as e:
+            self.logger.warning(f"Crawl cache lookup failed for {url}: {str(e)}")
+            return None
+        if cached is not None:
+            await self.log_execution(f"Crawl cache hit for {url}")
+        return cached
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str) -> AsyncIterator[None]:
+        """Hold one of a host's concurrent crawl slots, dropping the host's semaphore once idle"""
+        host = urlparse(url).netloc.lower().replace("www.", "")
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(settings.CRAWL_PER_HOST_CONCURRENCY)
+        semaphore = self._host_semaphores[host]
+        self._host_users[host] = self._host_users.get(host, 0) + 1
+
+        try:
+            async with semaphore:
+                yield
+        finally:
+            self._host_users[host] -= 1
+            if not self._host_users[host]:
+                del self._host_users[host]
+                del self._host_semaphores[host]
+
+    def _crawl_single_url(self, url: str, params: Dict[str, Any], cache_key: Optional[str] = None) -> Dict[str, Any]:
+        """Crawl a single URL using Firecrawl, caching the result under cache_key when given"""
         try:
             # Scrape with structured data extraction
-            scrape_result = self.client.scrape_url(
+            scrape_result = call_with_resilience(
+                "firecrawl",
+                self.client.scrape_url,
                 url=url,
-                params={
-                    "formats": ["markdown", "html"],
-                    "includeTags": ["title", "meta", "h1", "h2", "h3", "p", "div"],
-                    "onlyMainContent": True,
-                    "waitFor": 3000
-                }
+                params=params
             )
 
             # Extract structured data
             structured_data = self._extract_structured_data(scrape_result)
 
-            return {
+            CRAWL_BYTES.inc(len(scrape_result.get("markdown", "").encode("utf-8")))
+
+            crawl_result = {
                 "content": scrape_result.get("markdown", ""),
-                "html": scrape_result.get("html", ""),
                 "metadata": scrape_result.get("metadata", {}),
                 "structured_data": structured_data
             }
+            # Only keep heavy payloads the caller asked for
+            if "html" in params["formats"]:
+                crawl_result["html"] = scrape_result.get("html", "")
         except Exception as e:
             raise Exception(f"Firecrawl error for {url}: {str(e)}")
 
+        if cache_key:
+            try:
+                self.cache.set(cache_key, crawl_result)
+            except Exception as e:
+                self.logger.warning(f"Failed to cache crawl for {url}: {str(e)}")
+
+        return crawl_result
+
+    def _canonicalize_url(self, url: str) -> str:
+        """Normalize a URL so equivalent addresses share a cache entry"""
+        parsed = urlparse(url.strip())
+        scheme = (parsed.scheme or "https").lower()
+        host = parsed.netloc.lower()
+        if host.startswith("www."):
+            host = host[4:]
+        if (scheme == "http" and host.endswith(":80")) or (scheme == "https" and host.endswith(":443")):
+            host = host.rsplit(":", 1)[0]
+
+        path = parsed.path.rstrip("/") or "/"
+        query = urlencode(sorted(
+            (key, value) for key, value in parse_qsl(parsed.query)
+            if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+        ))
+
+        return urlunparse((scheme, host, path, "", query, ""))
+
     def _extract_structured_data(self, scrape_result: Dict[str, Any]) -> Dict[str, Any]:
         """Extract structured business data from crawled content"""
         content = scrape_result.get("markdown", "")
         metadata = scrape_result.get("metadata", {})
 
+        company_info, products_services, pricing_info, contact_info = self._scan_content(content)
+
         structured = {
             "title": metadata.get("title", ""),
             "description": metadata.get("description", ""),
             "keywords": metadata.get("keywords", []),
-            "company_info": self._extract_company_info(content),
-            "products_services": self._extract_products_services(content),
-            "pricing_info": self._extract_pricing_info(content),
-            "contact_info": self._extract_contact_info(content)
+            "company_info": company_info,
+            "products_services": products_services,
+            "pricing_info": pricing_info,
+            "contact_info": contact_info
         }
 
         return structured
 
-    def _extract_company_info(self, content: str) -> Dict[str, Any]:
-        """Extract company information from content"""
-        # Basic extraction logic - could be enhanced with NLP
-        lines = content.lower().split('\n')
+    def _scan_content(self, content: str):
+        """Extract company, product, pricing and contact sections from one keyword scan of the content"""
+        # Basic keyword extraction - could be enhanced with NLP
         company_info = {
             "about": "",
             "industry": "",
             "size": "",
             "founded": ""
         }
+        products = []
+        contact = {
+            "email": "",
+            "phone": "",
+            "address": ""
+        }
+        seen_categories = set()
 
-        for line in lines:
-            if any(keyword in line for keyword in ["about us", "about", "company"]):
-                company_info["about"] = line.strip()
-            elif any(keyword in line for keyword in ["industry", "sector"]):
-                company_info["industry"] = line.strip()
-            elif any(keyword in line for keyword in ["founded", "established"]):
-                company_info["founded"] = line.strip()
+        lowered = content.lower()
+        lines = content.split('\n')
+        lower_lines = lowered.split('\n')
 
-        return company_info
+        for index, categories in sorted(self._find_keyword_lines(lowered, lower_lines).items()):
+            line = lines[index]
+            lower_line = lower_lines[index]
+            seen_categories |= categories
 
-    def _extract_products_services(self, content: str) -> List[str]:
-        """Extract products and services from content"""
-        products = []
-        lines = content.lower().split('\n')
+            # Later lines overwrite earlier ones, with about > industry > founded per line
+            if "about" in categories:
+                company_info["about"] = lower_line.strip()
+            elif "industry" in categories:
+                company_info["industry"] = lower_line.strip()
+            elif "founded" in categories:
+                company_info["founded"] = lower_line.strip()
 
-        for line in lines:
-            if any(keyword in line for keyword in ["products", "services", "solutions", "offerings"]):
-                products.append(line.strip())
+            if "products" in categories and len(products) < 10:  # Limit to top 10
+                products.append(lower_line.strip())
 
-        return products[:10]  # Limit to top 10
+            if "email" in categories and "." in line:
+                contact["email"] = line.strip()
+            elif "phone" in categories:
+                contact["phone"] = line.strip()
+            elif "address" in categories:
+                contact["address"] = line.strip()
 
-    def _extract_pricing_info(self, content: str) -> Dict[str, Any]:
-        """Extract pricing information from content"""
         pricing = {
             "has_pricing": False,
             "pricing_model": "",
             "plans": []
         }
 
-        content_lower = content.lower()
-        if any(keyword in content_lower for keyword in ["pricing", "price", "cost", "$", "€", "£"]):
+        if "pricing" in seen_categories:
             pricing["has_pricing"] = True
 
             # Extract pricing models
-            if "subscription" in content_lower or "monthly" in content_lower:
+            if "subscription" in seen_categories:
                 pricing["pricing_model"] = "subscription"
-            elif "one-time" in content_lower or "purchase" in content_lower:
+            elif "one_time" in seen_categories:
                 pricing["pricing_model"] = "one-time"
-            elif "freemium" in content_lower or "free trial" in content_lower:
+            elif "freemium" in seen_categories:
                 pricing["pricing_model"] = "freemium"
 
-        return pricing
+        return company_info, products, pricing, contact
 
-    def _extract_contact_info(self, content: str) -> Dict[str, Any]:
-        """Extract contact information from content"""
-        contact = {
-            "email": "",
-            "phone": "",
-            "address": ""
-        }
+    def _find_keyword_lines(self, lowered: str, lower_lines: List[str]) -> Dict[int, Set[str]]:
+        """Map each line containing a section keyword to the categories it matches"""
+        # Offsets of each line start, so a match position can be mapped to its line
+        line_starts = [0]
+        for lower_line in lower_lines[:-1]:
+            line_starts.append(line_starts[-1] + len(lower_line) + 1)
 
-        # Simple regex-like extraction
-        lines = content.split('\n')
-        for line in lines:
-            if "@" in line and "." in line:
-                contact["email"] = line.strip()
-            elif any(keyword in line.lower() for keyword in ["phone", "tel", "call"]):
-                contact["phone"] = line.strip()
-            elif any(keyword in line.lower() for keyword in ["address", "location"]):
-                contact["address"] = line.strip()
+        keyword_lines: Dict[int, Set[str]] = {}
+        for keyword, category in KEYWORD_CATEGORIES.items():
+            # str.find runs in C and also reports overlapping keywords
+            position = lowered.find(keyword)
+            while position != -1:
+                index = bisect_right(line_starts, position) - 1
+                keyword_lines.setdefault(index, set()).add(category)
+                position = lowered.find(keyword, line_starts[index + 1] if index + 1 < len(line_starts) else len(lowered))
 
-        return contact
\ No newline at end of file
+        return keyword_lines
@@ -0,0 +1,66 @@
+from .base_agent import BaseAgent
+from .prompt_builder import PromptBuilder
+import google.generativeai as genai
+from app.core.config import settings
+from app.core.cache import PersistentCache
+from app.core.deadline import within_deadline
+from app.core.resilience import acall_with_resilience
+from app.core.metrics import LLM_PROMPT_TOKENS
+from typing import Any
+
+class GeminiAgent(BaseAgent):
+    """Base class for agents that call Gemini, with a prompt-keyed response cache"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        if not settings.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY is required")
+
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self.model_name = settings.GEMINI_MODEL
+        self.model = genai.GenerativeModel(self.model_name)
+        self.prompt_builder = PromptBuilder()
+
+        if settings.LLM_CACHE_ENABLED:
+            self.response_cache = PersistentCache(
+                namespace="llm",
+                ttl=settings.LLM_CACHE_TTL,
+                max_bytes=settings.LLM_CACHE_MAX_BYTES
+            )
+        else:
+            self.response_cache = None
+
+    async def _generate(self, prompt: str) -> str:
+        """Send a prompt to Gemini without blocking the event loop or outliving the request deadline"""
+        LLM_PROMPT_TOKENS.observe(self.prompt_builder.estimate_tokens(prompt), agent=self.name)
+        response = await acall_with_resilience(
+            "gemini",
+            lambda: within_deadline(self.model.generate_content_async(prompt))
+        )
+        return response.text
+
+    def _prompt_cache_key(self, prompt: str) -> str:
+        """Build the response cache key for a prompt sent to this model"""
+        return PersistentCache.make_key(self.model_name, prompt)
+
+    async def _get_cached_response(self, cache_key: str) -> Any:
+        """Look up a previously parsed Gemini response"""
+        if not self.response_cache:
+            return None
+        try:
+            cached = await self.response_cache.aget(cache_key)
+        except Exception as e:
+            self.logger.warning(f"LLM cache lookup failed: {str(e)}")
+            return None
+        if cached is not None:
+            await self.log_execution("LLM cache hit")
+        return cached
+
+    async def _cache_response(self, cache_key: str, value: Any):
+        """Store a parsed Gemini response for identical future prompts"""
+        if not self.response_cache:
+            return
+        try:
+            await self.response_cache.aset(cache_key, value)
+        except Exception as e:
+            self.logger.warning(f"Failed to cache LLM response: {str(e)}")
@@ -0,0 +1,169 @@
+from typing import Dict, Any, List, Tuple
+import json
+import re
+
+# Rough characters-per-token ratio for English web copy with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+# Shortest partial line worth keeping when a block is cut to fit the budget
+MIN_FRAGMENT_TOKENS = 16
+
+# Keywords that make a content block worth spending prompt tokens on
+RELEVANCE_KEYWORDS = {
+    "pricing": (3.0, ["pricing", "price", "per month", "/mo", "plan", "$", "€", "£", "free trial", "enterprise"]),
+    "product": (2.0, ["product", "platform", "feature", "solution", "service", "integration", "api"]),
+    "about": (2.0, ["about", "mission", "founded", "team", "customers", "company"]),
+    "market": (1.0, ["industry", "market", "trusted by", "case study", "compare", "alternative"])
+}
+
+# Phrases typical of navigation, footers and consent banners
+BOILERPLATE_PATTERN = re.compile(
+    r"cookie|all rights reserved|privacy policy|terms of (service|use)|sign in|log in|subscribe to our newsletter|skip to content"
+)
+MARKDOWN_LINK_PATTERN = re.compile(r"\[[^\]]*\]\([^)]*\)")
+BLOCK_SEPARATOR_PATTERN = re.compile(r"\n\s*\n|\n(?=#)")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+SENTENCE_END_PATTERN = re.compile(r"[.!?][\"')\]]*\s")
+
+class PromptBuilder:
+    """Assembles prompt context within a token budget, keeping the most relevant content"""
+
+    def estimate_tokens(self, text: str) -> int:
+        """Estimate the token count of a piece of text"""
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+    def select_content(self, content: str, structured_data: Dict[str, Any], token_budget: int) -> str:
+        """Pick the most relevant, de-duplicated content blocks that fit the token budget"""
+        blocks = self._split_blocks(content)
+        if not blocks:
+            return ""
+
+        extracted_lines = self._extracted_lines(structured_data)
+        ranked = sorted(
+            (
+                (self._score_block(block, index, extracted_lines), index, block)
+                for index, block in enumerate(blocks)
+            ),
+            key=lambda item: (-item[0], item[1])
+        )
+
+        selected: List[Tuple[int, str]] = []
+        remaining = token_budget
+        for score, index, block in ranked:
+            if remaining <= 0:
+                break
+            tokens = self.estimate_tokens(block)
+            if tokens > remaining:
+                block = self._truncate_block(block, remaining)
+                if not block:
+                    continue
+                tokens = self.estimate_tokens(block)
+            selected.append((index, block))
+            remaining -= tokens + 1
+
+        # Keep the page's original reading order for the selected blocks
+        return "\n\n".join(block for _, block in sorted(selected))
+
+    def compact_structured_data(self, structured_data: Dict[str, Any], token_budget: int) -> str:
+        """Serialize structured data as valid compact JSON that fits the token budget"""
+        data = {key: value for key, value in structured_data.items() if value not in ("", [], {}, None)}
+        serialized = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+        # Shrink whichever field is largest, so one long scalar cannot crowd out short list items;
+        # whole values are dropped so the JSON is never cut mid-token
+        while data and self.estimate_tokens(serialized) > token_budget:
+            largest = max(data, key=lambda key: self._serialized_size(data[key]))
+            value = data[largest]
+            if isinstance(value, list) and len(value) > 1:
+                data[largest] = value[:-1]
+            elif isinstance(value, dict) and len(value) > 1:
+                biggest = max(value, key=lambda key: self._serialized_size(value[key]))
+                data[largest] = {key: item for key, item in value.items() if key != biggest}
+            else:
+                del data[largest]
+            serialized = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+        return serialized
+
+    def _serialized_size(self, value: Any) -> int:
+        """Length of a value once serialized into the prompt"""
+        return len(json.dumps(value, separators=(",", ":"), ensure_ascii=False))
+
+    def _split_blocks(self, content: str) -> List[str]:
+        """Split markdown into paragraph/heading blocks and drop boilerplate and duplicates"""
+        blocks = []
+        seen = set()
+
+        for raw_block in BLOCK_SEPARATOR_PATTERN.split(content):
+            block = raw_block.strip()
+            if not block:
+                continue
+
+            normalized = WHITESPACE_PATTERN.sub(" ", block.lower())
+            if normalized in seen or self._is_boilerplate(block, normalized):
+                continue
+            seen.add(normalized)
+            blocks.append(block)
+
+        return blocks
+
+    def _is_boilerplate(self, block: str, normalized: str) -> bool:
+        """Detect navigation menus, link lists, footers and consent banners"""
+        link_text_length = sum(len(link) for link in MARKDOWN_LINK_PATTERN.findall(block))
+        if link_text_length > len(block) * 0.6:
+            return True
+        return len(normalized) < 200 and bool(BOILERPLATE_PATTERN.search(normalized))
+
+    def _extracted_lines(self, structured_data: Dict[str, Any]) -> List[str]:
+        """Collect the lines the crawler already flagged as about, product or pricing content"""
+        lines = []
+        company_info = structured_data.get("company_info") or {}
+        lines.extend(value for value in company_info.values() if value)
+        lines.extend(structured_data.get("products_services") or [])
+        return [line for line in lines if len(line) > 3]
+
+    def _score_block(self, block: str, index: int, extracted_lines: List[str]) -> float:
+        """Score a block by business relevance, with a slight preference for earlier content"""
+        lowered = block.lower()
+        score = 0.0
+
+        for weight, keywords in RELEVANCE_KEYWORDS.values():
+            if any(keyword in lowered for keyword in keywords):
+                score += weight
+
+        if any(line in lowered for line in extracted_lines):
+            score += 2.0
+
+        if block.startswith("#"):
+            score += 0.5
+
+        return score + 1.0 / (1 + index)
+
+    def _truncate_block(self, block: str, token_budget: int) -> str:
+        """Keep the leading lines of a block that fit the budget, cutting the first line that does not at a boundary"""
+        kept = []
+        used = 0
+        for line in block.split("\n"):
+            tokens = self.estimate_tokens(line) + 1
+            if used + tokens > token_budget:
+                # A long paragraph is a single line, so cut it rather than drop the whole block
+                if token_budget - used - 1 >= MIN_FRAGMENT_TOKENS:
+                    kept.append(self._cut_at_boundary(line, (token_budget - used - 1) * CHARS_PER_TOKEN))
+                break
+            kept.append(line)
+            used += tokens
+        return "\n".join(kept).strip()
+
+    def _cut_at_boundary(self, text: str, max_chars: int) -> str:
+        """Shorten text to max_chars, ending at the last sentence boundary or, failing that, the last word boundary"""
+        # One extra character so a boundary right at the limit still counts
+        head = text[:max_chars + 1]
+        sentence_ends = [match.end() - 1 for match in SENTENCE_END_PATTERN.finditer(head)]
+        # Prefer a sentence boundary unless it would discard most of the room available
+        if sentence_ends and sentence_ends[-1] >= max_chars // 2:
+            return head[:sentence_ends[-1]].strip()
+
+        word_end = head.rfind(" ")
+        if word_end > 0:
+            return head[:word_end].strip()
+        return head[:max_chars].strip()
@@ -1,26 +1,39 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Request
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse
+from starlette.background import BackgroundTask
 from app.models.schemas import (
     CompetitorDiscoveryRequest,
     DiscoveryResponse,
     AnalysisResponse,
     ComparisonReport,
-    ExportRequest
+    ComparisonMatrixRequest,
+    ComparisonMatrixResponse,
+    ExportRequest,
+    BulkExportRequest,
+    JobStatusResponse
 )
-from app.services.discovery_service import DiscoveryService
-from app.services.analysis_service import AnalysisService
-from app.services.comparison_service import ComparisonService
-from app.services.export_service import ExportService
+from app.services.registry import ServiceRegistry
+from app.services.export_service import ExportQueueFullError
+from app.services.columnar_export import COLUMNAR_FORMATS
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
+from app.core.resilience import get_circuit_metrics
+from app.core.metrics import REGISTRY
 import uuid
+import json
 from typing import List
 
 api_router = APIRouter()
 
+def get_services(request: Request) -> ServiceRegistry:
+    """Resolve the application-scoped service registry"""
+    return request.app.state.services
+
 @api_router.post("/discover", response_model=DiscoveryResponse)
-async def discover_competitors(request: CompetitorDiscoveryRequest):
+async def discover_competitors(request: CompetitorDiscoveryRequest, services: ServiceRegistry = Depends(get_services)):
     """Discover competitors based on URL or business description"""
     try:
-        discovery_service = DiscoveryService()
+        discovery_service = services.discovery_service()
         result = await discovery_service.discover_competitors(
             input_type=request.input_type,
             input_value=request.input_value
@@ -29,46 +42,204 @@ async def discover_competitors(request: CompetitorDiscoveryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/discover/metrics")
+async def discovery_provider_metrics(services: ServiceRegistry = Depends(get_services)):
+    """Latency and success metrics for each discovery provider"""
+    try:
+        return services.discovery_service().get_provider_metrics()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/providers/circuits")
+async def provider_circuit_metrics():
+    """Circuit breaker state, retry and rejection counts for each external provider"""
+    return get_circuit_metrics()
+
 @api_router.post("/analyze", response_model=AnalysisResponse)
-async def analyze_competitors(competitor_urls: List[str]):
+async def analyze_competitors(
+    competitor_urls: List[str],
+    bypass_cache: bool = False,
+    services: ServiceRegistry = Depends(get_services)
+):
     """Analyze competitors and generate comprehensive reports"""
     try:
-        analysis_service = AnalysisService()
-        result = await analysis_service.analyze_competitors(competitor_urls)
+        analysis_service = services.analysis_service()
+        result = await analysis_service.analyze_competitors(competitor_urls, bypass_cache=bypass_cache)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/analyze/stream")
+async def stream_competitor_analysis(
+    competitor_urls: List[str],
+    bypass_cache: bool = False,
+    services: ServiceRegistry = Depends(get_services)
+):
+    """Stream competitor reports as NDJSON as each one completes, followed by the summary"""
+    if not competitor_urls:
+        raise HTTPException(status_code=400, detail="At least one competitor URL is required")
+
+    try:
+        analysis_service = services.analysis_service()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_stream():
+        try:
+            async for event in analysis_service.stream_competitor_analyses(competitor_urls, bypass_cache=bypass_cache):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @api_router.post("/compare", response_model=ComparisonReport)
-async def compare_competitors(company_a_url: str, company_b_url: str):
+async def compare_competitors(
+    company_a_url: str,
+    company_b_url: str,
+    bypass_cache: bool = False,
+    services: ServiceRegistry = Depends(get_services)
+):
     """Compare two competitors side by side"""
     try:
-        comparison_service = ComparisonService()
-        result = await comparison_service.compare_competitors(company_a_url, company_b_url)
+        comparison_service = services.comparison_service()
+        result = await comparison_service.compare_competitors(
+            company_a_url,
+            company_b_url,
+            bypass_cache=bypass_cache
+        )
+        return result
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/compare/matrix", response_model=ComparisonMatrixResponse)
+async def compare_competitor_matrix(
+    request: ComparisonMatrixRequest,
+    bypass_cache: bool = False,
+    services: ServiceRegistry = Depends(get_services)
+):
+    """Compare every pair of companies, crawling and analyzing each one only once"""
+    if len(set(request.company_urls)) < 2:
+        raise HTTPException(status_code=400, detail="At least two distinct company URLs are required")
+    if len(set(request.company_urls)) > settings.MAX_COMPETITORS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.MAX_COMPETITORS} companies can be compared")
+
+    try:
+        comparison_service = services.comparison_service()
+        result = await comparison_service.compare_matrix(request.company_urls, bypass_cache=bypass_cache)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/jobs/analyze", response_model=JobStatusResponse, status_code=202)
+async def submit_analysis_job(
+    competitor_urls: List[str],
+    bypass_cache: bool = False,
+    services: ServiceRegistry = Depends(get_services)
+):
+    """Queue a competitor analysis and return its job id immediately"""
+    try:
+        return await services.job_service().submit("analysis", {
+            "competitor_urls": competitor_urls,
+            "bypass_cache": bypass_cache
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/jobs/compare", response_model=JobStatusResponse, status_code=202)
+async def submit_comparison_job(
+    company_a_url: str,
+    company_b_url: str,
+    bypass_cache: bool = False,
+    services: ServiceRegistry = Depends(get_services)
+):
+    """Queue a two-company comparison and return its job id immediately"""
+    try:
+        return await services.job_service().submit("comparison", {
+            "company_a_url": company_a_url,
+            "company_b_url": company_b_url,
+            "bypass_cache": bypass_cache
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str, services: ServiceRegistry = Depends(get_services)):
+    """Fetch the status and, once finished, the result of a background job"""
+    job = await services.job_service().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @api_router.post("/export")
-async def export_report(request: ExportRequest):
+async def export_report(request: ExportRequest, services: ServiceRegistry = Depends(get_services)):
     """Export analysis or comparison reports as PDF or CSV"""
     try:
-        export_service = ExportService()
+        export_service = services.export_service()
+        filename = f"competitor_report_{uuid.uuid4()}.{request.format}"
+
+        if request.format.lower() == "csv":
+            try:
+                chunks = export_service.stream_csv(request.data_type, request.data)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return StreamingResponse(
+                chunks,
+                media_type="text/csv",
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+            )
+
         file_path = await export_service.export_data(
             format=request.format,
             data_type=request.data_type,
             data=request.data
         )
 
-        filename = f"competitor_report_{uuid.uuid4()}.{request.format}"
         return FileResponse(
             path=file_path,
             filename=filename,
-            media_type='application/octet-stream'
+            media_type='application/octet-stream',
+            background=BackgroundTask(export_service.release, file_path)
         )
+    except HTTPException:
+        raise
+    except ExportQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/export/bulk")
+async def export_bulk(request: BulkExportRequest, services: ServiceRegistry = Depends(get_services)):
+    """Stream many analyses or comparisons as a single Parquet or Arrow file"""
+    try:
+        if request.data is not None:
+            payloads = ((None, payload) for payload in request.data)
+        else:
+            payloads = services.job_service().iter_results(request.data_type, request.since, request.until)
+
+        chunks = services.export_service().stream_columnar(request.format, request.data_type, payloads)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Bulk export requires pyarrow to be installed")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    extension, media_type = COLUMNAR_FORMATS[request.format]
+    filename = f"competitor_{request.data_type}_{uuid.uuid4()}.{extension}"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Latency histograms and counters for agents, providers, caches and services in Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @api_router.get("/health")
 async def health_check():
     """Health check endpoint"""
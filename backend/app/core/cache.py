@@ -0,0 +1,244 @@
+from app.core.database import get_connection
+from app.core.metrics import CACHE_LOOKUPS
+from typing import Any, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+# Partially written artifacts older than this are assumed abandoned by a crashed render
+STALE_PARTIAL_SECONDS = 3600
+
+class PersistentCache:
+    """SQLite-backed key/value cache with TTL expiry and size-bounded LRU eviction"""
+
+    _schema_lock = threading.Lock()
+    _schema_ready = False
+
+    def __init__(self, namespace: str, ttl: int, max_bytes: int):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._ensure_schema()
+
+    @classmethod
+    def _ensure_schema(cls):
+        """Create the cache table on first use"""
+        with cls._schema_lock:
+            if cls._schema_ready:
+                return
+            with get_connection() as connection:
+                connection.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS cache_entries (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        expires_at REAL NOT NULL,
+                        last_access REAL NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )
+                    """
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_cache_lru ON cache_entries (namespace, last_access)"
+                )
+            cls._schema_ready = True
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Build a stable cache key from JSON-serializable parts"""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        now = time.time()
+        with get_connection() as connection:
+            row = connection.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+
+            if row is None:
+                CACHE_LOOKUPS.inc(namespace=self.namespace, result="miss")
+                return None
+
+            value, expires_at = row
+            if expires_at < now:
+                connection.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                )
+                CACHE_LOOKUPS.inc(namespace=self.namespace, result="miss")
+                return None
+
+            connection.execute(
+                "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+
+        CACHE_LOOKUPS.inc(namespace=self.namespace, result="hit")
+        return json.loads(value)
+
+    def set(self, key: str, value: Any):
+        """Store a value and evict expired or least recently used entries"""
+        now = time.time()
+        payload = json.dumps(value, default=str)
+        size = len(payload.encode("utf-8"))
+
+        # Entries larger than the whole budget would evict everything else
+        if size > self.max_bytes:
+            return
+
+        with get_connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entries "
+                "(namespace, key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.namespace, key, payload, size, now + self.ttl, now)
+            )
+            self._evict(connection, now)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """Non-blocking variant of get for use inside coroutines"""
+        return await asyncio.get_event_loop().run_in_executor(None, self.get, key)
+
+    async def aset(self, key: str, value: Any):
+        """Non-blocking variant of set for use inside coroutines"""
+        await asyncio.get_event_loop().run_in_executor(None, self.set, key, value)
+
+    def delete(self, key: str):
+        """Remove a single entry"""
+        with get_connection() as connection:
+            connection.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            )
+
+    def clear(self):
+        """Remove every entry in this namespace"""
+        with get_connection() as connection:
+            connection.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def _evict(self, connection, now: float):
+        """Drop expired entries, then least recently used ones until under the size budget"""
+        connection.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND expires_at < ?",
+            (self.namespace, now)
+        )
+
+        total_size = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?",
+            (self.namespace,)
+        ).fetchone()[0]
+
+        if total_size <= self.max_bytes:
+            return
+
+        rows = connection.execute(
+            "SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY last_access ASC",
+            (self.namespace,)
+        ).fetchall()
+
+        stale_keys = []
+        for key, size in rows:
+            if total_size <= self.max_bytes:
+                break
+            stale_keys.append((self.namespace, key))
+            total_size -= size
+
+        connection.executemany(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+            stale_keys
+        )
+
+class ArtifactCache:
+    """Content-addressed directory of rendered files with age-based expiry and size-bounded LRU eviction
+
+    A file's mtime is its render time and bounds its age, so anything stamped into it at render time
+    is never older than the TTL; its atime records the last hit and orders LRU eviction.
+    """
+
+    def __init__(self, directory: str, ttl: int, max_bytes: int, namespace: str = "export"):
+        self.namespace = namespace
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key: str, suffix: str) -> str:
+        """Final location of the artifact for a key"""
+        return os.path.join(self.directory, f"{key}.{suffix}")
+
+    def partial_path_for(self, key: str, suffix: str) -> str:
+        """Unique scratch location to render into before the artifact is published"""
+        return os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.{suffix}.partial")
+
+    def get(self, key: str, suffix: str) -> Optional[str]:
+        """Return the artifact path if present and not expired, refreshing its access time"""
+        path = self.path_for(key, suffix)
+        try:
+            rendered_at = os.path.getmtime(path)
+            now = time.time()
+            if rendered_at + self.ttl < now:
+                os.remove(path)
+                CACHE_LOOKUPS.inc(namespace=self.namespace, result="miss")
+                return None
+            # Touch only the access time so hits keep the file warm without extending its lifetime
+            os.utime(path, (now, rendered_at))
+        except FileNotFoundError:
+            CACHE_LOOKUPS.inc(namespace=self.namespace, result="miss")
+            return None
+        CACHE_LOOKUPS.inc(namespace=self.namespace, result="hit")
+        return path
+
+    def publish(self, key: str, suffix: str, partial_path: str) -> str:
+        """Atomically move a finished render into place and enforce the size budget"""
+        path = self.path_for(key, suffix)
+        os.replace(partial_path, path)
+        now = time.time()
+        os.utime(path, (now, now))
+        self.cleanup(keep=path)
+        return path
+
+    def cleanup(self, keep: Optional[str] = None):
+        """Drop expired and abandoned files, then least recently used ones until under the size budget"""
+        now = time.time()
+        entries: List[Tuple[float, int, str]] = []
+
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+
+            if entry.name.endswith(".partial"):
+                if stat.st_mtime + STALE_PARTIAL_SECONDS < now:
+                    self._remove(entry.path)
+                continue
+            if stat.st_mtime + self.ttl < now:
+                self._remove(entry.path)
+                continue
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total_size -= size
+
+    def _remove(self, path: str):
+        """Delete a file that may already have been removed by another worker"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -11,6 +11,21 @@ class Settings(BaseSettings):
     FIRECRAWL_API_KEY: str = os.getenv("FIRECRAWL_API_KEY", "")
     EXA_API_KEY: str = os.getenv("EXA_API_KEY", "")
 
+    # Gemini
+    GEMINI_MODEL: str = "gemini-pro"
+    ANALYSIS_CONCURRENCY: int = 4
+    ANALYSIS_BATCH_SIZE: int = 4
+    ANALYSIS_BATCH_CONTENT_TOKEN_BUDGET: int = 600
+
+    # Prompt token budgets
+    ANALYSIS_CONTENT_TOKEN_BUDGET: int = 1500
+    ANALYSIS_STRUCTURED_TOKEN_BUDGET: int = 400
+    COMPARISON_CONTENT_TOKEN_BUDGET: int = 800
+
+    # Map-reduce market summary
+    SUMMARY_GROUP_SIZE: int = 6
+    SUMMARY_DIGEST_TOKEN_BUDGET: int = 250
+
     # CORS
     ALLOWED_ORIGINS: List[str] = [
         "http://localhost:3000",
@@ -25,6 +40,60 @@ class Settings(BaseSettings):
     # Application settings
     MAX_COMPETITORS: int = 10
     ANALYSIS_TIMEOUT: int = 300
+    # Seconds workflow steps may keep running past the deadline to return what they finished before being cancelled
+    WORKFLOW_DEADLINE_GRACE: float = 2.0
+    JOB_WORKERS: int = 2
+    # Seconds a worker's claim on a running job lasts without a heartbeat before another worker may take it over
+    JOB_LEASE_SECONDS: int = 60
+    DISCOVERY_PROVIDER_TIMEOUT: float = 8.0
+    DEDUP_SIMILARITY_THRESHOLD: float = 0.5
+
+    # Export rendering
+    EXPORT_WORKERS: int = 2
+    EXPORT_QUEUE_LIMIT: int = 8
+    EXPORT_BULK_ROW_GROUP_SIZE: int = 10000
+
+    # Export artifact cache
+    EXPORT_CACHE_ENABLED: bool = True
+    EXPORT_CACHE_DIR: str = "./export_cache"
+    EXPORT_CACHE_TTL: int = 86400
+    EXPORT_CACHE_MAX_BYTES: int = 500 * 1024 * 1024
+
+    # Provider retries and circuit breakers
+    RETRY_MAX_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY: float = 0.5
+    RETRY_MAX_DELAY: float = 8.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_TIMEOUT: float = 30.0
+    # Threads for blocking provider SDK calls, kept apart from the default executor used for cache and database work
+    PROVIDER_EXECUTOR_WORKERS: int = 16
+
+    # Provider rate limits, shared by all workers on a host; 0 disables a provider's limit
+    RATE_LIMIT_ENABLED: bool = True
+    GEMINI_REQUESTS_PER_MINUTE: float = 60
+    GEMINI_BURST: int = 10
+    FIRECRAWL_REQUESTS_PER_MINUTE: float = 20
+    FIRECRAWL_BURST: int = 5
+
+    # Discovery cache
+    DISCOVERY_CACHE_ENABLED: bool = True
+    DISCOVERY_CACHE_TTL: int = 86400
+    DISCOVERY_CACHE_MAX_BYTES: int = 20 * 1024 * 1024
+
+    # Crawling
+    CRAWL_CONCURRENCY: int = 5
+    CRAWL_PER_HOST_CONCURRENCY: int = 2
+    CRAWL_FORMATS: List[str] = ["markdown"]
+
+    # Crawl cache
+    CRAWL_CACHE_ENABLED: bool = True
+    CRAWL_CACHE_TTL: int = 21600
+    CRAWL_CACHE_MAX_BYTES: int = 200 * 1024 * 1024
+
+    # LLM response cache
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL: int = 604800
+    LLM_CACHE_MAX_BYTES: int = 50 * 1024 * 1024
 
     class Config:
         env_file = ".env"
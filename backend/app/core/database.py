@@ -0,0 +1,34 @@
+from app.core.config import settings
+from contextlib import contextmanager
+from typing import Iterator
+import sqlite3
+import os
+
+SQLITE_PREFIX = "sqlite:///"
+
+def get_database_path() -> str:
+    """Resolve the SQLite file path from the DATABASE_URL setting"""
+    if not settings.DATABASE_URL.startswith(SQLITE_PREFIX):
+        raise ValueError("Only sqlite:/// DATABASE_URL values are supported")
+    return settings.DATABASE_URL[len(SQLITE_PREFIX):]
+
+@contextmanager
+def get_connection() -> Iterator[sqlite3.Connection]:
+    """Open a short-lived SQLite connection, committing on success"""
+    path = get_database_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # A connection per call keeps this safe to use from executor threads
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        yield connection
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
@@ -0,0 +1,53 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, Optional, TypeVar
+import asyncio
+import time
+
+T = TypeVar("T")
+
+# Absolute monotonic time by which the current request must finish; tasks inherit it when created
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a provider call would outlive the current request deadline"""
+
+    def __init__(self, message: str = "Deadline exceeded"):
+        super().__init__(message)
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[None]:
+    """Bound everything awaited inside the block, keeping any tighter enclosing deadline"""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None when no deadline is set"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+def deadline_expired() -> bool:
+    """Whether the current deadline has passed"""
+    remaining = time_remaining()
+    return remaining is not None and remaining <= 0
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """Await a provider call, cancelling it when the current deadline passes"""
+    remaining = time_remaining()
+    if remaining is None:
+        return await awaitable
+
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded()
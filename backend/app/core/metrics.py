@@ -0,0 +1,286 @@
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
+import bisect
+import functools
+import threading
+import time
+
+# Latency buckets in seconds, from cache hits up to full analyses
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Prompt sizes in estimated tokens
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+LabelValues = Tuple[str, ...]
+
+T = TypeVar("T")
+
+class Metric:
+    """Named metric with a fixed set of label names, rendered in Prometheus text format"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        """Order label values by the declared label names"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        """Render a {name="value",...} label set"""
+        pairs = list(zip(self.labelnames, values))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> List[str]:
+        """HELP and TYPE lines followed by the samples"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        """Sample lines for every label set"""
+        raise NotImplementedError
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        """Add to the count for a label set"""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {_format_value(value)}" for key, value in values]
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str):
+        """Set the value for a label set"""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {_format_value(value)}" for key, value in values]
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets, plus their sum and count"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a trailing +Inf slot, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        """Record one observation"""
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the wall-clock duration of the block, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Process-wide set of metrics rendered together on the metrics endpoint"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric, returning the existing one if the name is already registered"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """Every metric in Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text exposition format"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    """Render integral values without a trailing .0"""
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+# Agents
+AGENT_EXECUTE_SECONDS = REGISTRY.register(Histogram(
+    "agent_execute_seconds", "Duration of agent execute calls", ["agent"]
+))
+AGENT_EXECUTE_ERRORS = REGISTRY.register(Counter(
+    "agent_execute_errors_total", "Agent execute calls that raised", ["agent"]
+))
+AGENT_STEP_SECONDS = REGISTRY.register(Histogram(
+    "agent_step_seconds", "Duration of orchestrated workflow steps by agent and method", ["agent", "method"]
+))
+AGENT_STEP_ERRORS = REGISTRY.register(Counter(
+    "agent_step_errors_total", "Orchestrated workflow steps that raised", ["agent", "method"]
+))
+LLM_PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "llm_prompt_tokens", "Estimated size of prompts sent to the LLM", ["agent"], buckets=TOKEN_BUCKETS
+))
+LLM_PARSE_SECONDS = REGISTRY.register(Histogram(
+    "llm_parse_seconds", "Time spent parsing LLM responses", ["agent"]
+))
+CRAWL_BYTES = REGISTRY.register(Counter(
+    "crawl_content_bytes_total", "Bytes of page content fetched from the crawler, excluding cache hits"
+))
+
+# External providers
+PROVIDER_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "provider_request_seconds", "Duration of individual provider requests, one per attempt", ["provider"]
+))
+PROVIDER_REQUESTS = REGISTRY.register(Counter(
+    "provider_requests_total", "Provider requests by outcome (success, error, rejected)", ["provider", "outcome"]
+))
+PROVIDER_CIRCUIT_STATE = REGISTRY.register(Gauge(
+    "provider_circuit_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open", ["provider"]
+))
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "rate_limit_wait_seconds", "Time spent queued for a provider rate limit token", ["provider"]
+))
+DISCOVERY_PROVIDER_SECONDS = REGISTRY.register(Histogram(
+    "discovery_provider_seconds", "Duration of discovery provider queries", ["provider"]
+))
+DISCOVERY_PROVIDER_REQUESTS = REGISTRY.register(Counter(
+    "discovery_provider_requests_total", "Discovery provider queries by outcome", ["provider", "outcome"]
+))
+
+# Services and caches
+SERVICE_CALL_SECONDS = REGISTRY.register(Histogram(
+    "service_call_seconds", "Duration of service method calls", ["service", "method"]
+))
+SERVICE_CALL_ERRORS = REGISTRY.register(Counter(
+    "service_call_errors_total", "Service method calls that raised", ["service", "method"]
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "cache_lookups_total", "Cache lookups by namespace and result (hit, miss)", ["namespace", "result"]
+))
+
+def instrument_service(service: str) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Wrap an async service method in a latency span and error counter"""
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        method = func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            with SERVICE_CALL_SECONDS.time(service=service, method=method):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    SERVICE_CALL_ERRORS.inc(service=service, method=method)
+                    raise
+
+        return wrapper
+    return decorator
+
+def instrument_stream(service: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Wrap a method returning a sync or async iterator in a span that lasts until the stream ends or is closed
+
+    The method is still called eagerly, so validation errors it raises reach the caller straight away.
+    """
+    def decorator(func: Callable[..., Union[Iterator[T], AsyncIterator[T]]]) -> Callable[..., Union[Iterator[T], AsyncIterator[T]]]:
+        method = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Union[Iterator[T], AsyncIterator[T]]:
+            start = time.perf_counter()
+            try:
+                stream = func(*args, **kwargs)
+            except Exception:
+                SERVICE_CALL_ERRORS.inc(service=service, method=method)
+                SERVICE_CALL_SECONDS.observe(time.perf_counter() - start, service=service, method=method)
+                raise
+            if hasattr(stream, "__aiter__"):
+                return _timed_async_stream(stream, service, method, start)
+            return _timed_stream(stream, service, method, start)
+
+        return wrapper
+    return decorator
+
+def _timed_stream(stream: Iterator[T], service: str, method: str, start: float) -> Iterator[T]:
+    """Pass items through, recording the stream's duration and failure"""
+    try:
+        yield from stream
+    except Exception:
+        SERVICE_CALL_ERRORS.inc(service=service, method=method)
+        raise
+    finally:
+        SERVICE_CALL_SECONDS.observe(time.perf_counter() - start, service=service, method=method)
+
+async def _timed_async_stream(stream: AsyncIterator[T], service: str, method: str, start: float) -> AsyncIterator[T]:
+    """Async variant of _timed_stream that also closes the wrapped generator when the consumer stops early"""
+    try:
+        async for item in stream:
+            yield item
+    except Exception:
+        SERVICE_CALL_ERRORS.inc(service=service, method=method)
+        raise
+    finally:
+        SERVICE_CALL_SECONDS.observe(time.perf_counter() - start, service=service, method=method)
+        if hasattr(stream, "aclose"):
+            await stream.aclose()
@@ -0,0 +1,129 @@
+from app.core.config import settings
+from app.core.database import get_connection
+from app.core.deadline import DeadlineExceeded, time_remaining
+from app.core.metrics import RATE_LIMIT_WAIT_SECONDS
+from typing import Dict, Optional
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("rate_limit")
+
+class RateLimiter:
+    """Token bucket per provider, shared by every worker process through the SQLite database
+
+    Callers reserve a token up front and the bucket may go negative, so each caller learns
+    exactly how long to wait for its turn. Excess load queues in arrival order instead of failing.
+    """
+
+    _schema_lock = threading.Lock()
+    _schema_ready = False
+
+    def __init__(self, provider: str, requests_per_minute: float, burst: int):
+        self.provider = provider
+        self.rate = requests_per_minute / 60.0
+        self.burst = max(1, burst)
+        self._ensure_schema()
+
+    @classmethod
+    def _ensure_schema(cls):
+        """Create the bucket table on first use"""
+        with cls._schema_lock:
+            if cls._schema_ready:
+                return
+            with get_connection() as connection:
+                connection.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS rate_limits (
+                        provider TEXT PRIMARY KEY,
+                        tokens REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                    """
+                )
+            cls._schema_ready = True
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """Take a token and return the seconds to wait before using it
+
+        Returns None without taking a token when the wait would exceed max_wait.
+        """
+        now = time.time()
+        with get_connection() as connection:
+            # Take the write lock before reading so concurrent workers cannot both spend a token
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT tokens, updated_at FROM rate_limits WHERE provider = ?",
+                (self.provider,)
+            ).fetchone()
+
+            tokens = float(self.burst) if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+            tokens -= 1
+            wait = max(0.0, -tokens / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+
+            connection.execute(
+                "INSERT OR REPLACE INTO rate_limits (provider, tokens, updated_at) VALUES (?, ?, ?)",
+                (self.provider, tokens, now)
+            )
+
+        return wait
+
+    def acquire(self):
+        """Block the calling thread until a token is available, never waiting past the request deadline
+
+        Executor threads only see the deadline when the caller copied its context into the thread.
+        """
+        try:
+            wait = self.reserve(time_remaining())
+        except sqlite3.Error as e:
+            # A locked or unavailable database should not take the provider down with it
+            logger.warning(f"Rate limiter unavailable for {self.provider}: {str(e)}")
+            return
+        if wait is None:
+            raise DeadlineExceeded(f"{self.provider} rate limit queue is longer than the request deadline")
+        RATE_LIMIT_WAIT_SECONDS.observe(wait, provider=self.provider)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        """Wait for a token without blocking the event loop or outliving the request deadline"""
+        remaining = time_remaining()
+        try:
+            wait = await asyncio.get_event_loop().run_in_executor(None, self.reserve, remaining)
+        except sqlite3.Error as e:
+            logger.warning(f"Rate limiter unavailable for {self.provider}: {str(e)}")
+            return
+        if wait is None:
+            raise DeadlineExceeded(f"{self.provider} rate limit queue is longer than the request deadline")
+        RATE_LIMIT_WAIT_SECONDS.observe(wait, provider=self.provider)
+        if wait:
+            await asyncio.sleep(wait)
+
+_limiters: Dict[str, Optional[RateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider: str) -> Optional[RateLimiter]:
+    """Shared limiter for a provider, or None when it has no configured quota"""
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = _build_rate_limiter(provider)
+        return _limiters[provider]
+
+def _build_rate_limiter(provider: str) -> Optional[RateLimiter]:
+    """Read a provider's quota from settings"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+
+    quotas = {
+        "gemini": (settings.GEMINI_REQUESTS_PER_MINUTE, settings.GEMINI_BURST),
+        "firecrawl": (settings.FIRECRAWL_REQUESTS_PER_MINUTE, settings.FIRECRAWL_BURST)
+    }
+    if provider not in quotas or quotas[provider][0] <= 0:
+        return None
+
+    requests_per_minute, burst = quotas[provider]
+    return RateLimiter(provider, requests_per_minute, burst)
@@ -0,0 +1,312 @@
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, deadline_expired, time_remaining
+from app.core.rate_limit import get_rate_limiter
+from app.core.metrics import PROVIDER_CIRCUIT_STATE, PROVIDER_REQUEST_SECONDS, PROVIDER_REQUESTS
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+import asyncio
+import contextvars
+import functools
+import logging
+import random
+import re
+import threading
+import time
+
+T = TypeVar("T")
+
+logger = logging.getLogger("resilience")
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+# Numeric circuit states exported as a gauge
+CIRCUIT_STATE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+# HTTP statuses worth retrying: timeouts, throttling and server-side failures
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Provider SDKs often only expose the status or cause in the message text
+RETRYABLE_MESSAGE_PATTERN = re.compile(
+    r"\b(408|425|429|500|502|503|504)\b|timed? ?out|temporar|unavailable|rate.?limit|too many requests"
+    r"|resource.?exhausted|connection (reset|aborted|refused|error)|overloaded",
+    re.IGNORECASE
+)
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while its circuit breaker is open"""
+
+class CircuitBreaker:
+    """Per-provider breaker that opens after consecutive retryable failures and probes after a cool-down"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        # Provider calls run both on the event loop and in executor threads
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "rejected": 0,
+            "opened": 0
+        }
+        PROVIDER_CIRCUIT_STATE.set(CIRCUIT_STATE_VALUES[self.state], provider=name)
+
+    def _set_state(self, state: str):
+        """Change state and publish it; callers hold the lock"""
+        self.state = state
+        PROVIDER_CIRCUIT_STATE.set(CIRCUIT_STATE_VALUES[state], provider=self.name)
+
+    def allow(self) -> bool:
+        """Whether a call may go through; lets a single probe through once the cool-down has passed"""
+        with self._lock:
+            if self.state == CIRCUIT_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(CIRCUIT_HALF_OPEN)
+                self._probe_in_flight = False
+
+            if self.state == CIRCUIT_CLOSED:
+                allowed = True
+            elif self.state == CIRCUIT_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                allowed = True
+            else:
+                allowed = False
+
+            if allowed:
+                self.stats["calls"] += 1
+            else:
+                self.stats["rejected"] += 1
+                PROVIDER_REQUESTS.inc(provider=self.name, outcome="rejected")
+            return allowed
+
+    def record_success(self):
+        """Close the circuit after a successful call"""
+        with self._lock:
+            self.stats["successes"] += 1
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            if self.state != CIRCUIT_CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+                self._set_state(CIRCUIT_CLOSED)
+
+    def record_failure(self, retryable: bool):
+        """Count a failed call; only retryable failures say anything about provider health"""
+        with self._lock:
+            self.stats["failures"] += 1
+            self._probe_in_flight = False
+            if not retryable:
+                return
+
+            self.consecutive_failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    self.stats["opened"] += 1
+                    logger.warning(f"Circuit for {self.name} opened after {self.consecutive_failures} failures")
+                self._set_state(CIRCUIT_OPEN)
+                self.opened_at = time.monotonic()
+
+    def cancel(self):
+        """Give back an allowed call that was never sent or never finished, freeing the half-open probe slot"""
+        with self._lock:
+            self.stats["calls"] -= 1
+            self._probe_in_flight = False
+
+    def record_retry(self):
+        """Count a retry attempt"""
+        with self._lock:
+            self.stats["retries"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state and counters"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                **self.stats
+            }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Process-wide breaker for a provider"""
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(
+                provider,
+                failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=settings.CIRCUIT_RESET_TIMEOUT
+            )
+        return _breakers[provider]
+
+def get_circuit_metrics() -> Dict[str, Dict[str, Any]]:
+    """Breaker state and counters for every provider called so far"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+_provider_executor: Optional[ThreadPoolExecutor] = None
+_provider_executor_lock = threading.Lock()
+
+def get_provider_executor() -> ThreadPoolExecutor:
+    """Thread pool reserved for blocking provider calls, so slow or abandoned calls cannot starve the default executor"""
+    global _provider_executor
+    with _provider_executor_lock:
+        if _provider_executor is None:
+            _provider_executor = ThreadPoolExecutor(
+                max_workers=settings.PROVIDER_EXECUTOR_WORKERS,
+                thread_name_prefix="provider"
+            )
+        return _provider_executor
+
+def shutdown_provider_executor():
+    """Stop the provider thread pool, dropping calls that have not started"""
+    global _provider_executor
+    with _provider_executor_lock:
+        if _provider_executor is not None:
+            _provider_executor.shutdown(wait=False, cancel_futures=True)
+            _provider_executor = None
+
+async def run_provider_call(func: Callable[..., T], *args: Any) -> T:
+    """Run a blocking provider call on the provider executor, carrying the request deadline into the thread"""
+    # run_in_executor does not copy contextvars, so the thread would not see the deadline otherwise
+    context = contextvars.copy_context()
+    return await asyncio.get_event_loop().run_in_executor(
+        get_provider_executor(), functools.partial(context.run, func, *args)
+    )
+
+def is_retryable(error: BaseException) -> bool:
+    """Classify transient provider errors: timeouts, throttling, 5xx and dropped connections"""
+    if isinstance(error, (DeadlineExceeded, CircuitOpenError)):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(error, "code", None),
+        getattr(getattr(error, "response", None), "status_code", None)
+    ):
+        if isinstance(status, int):
+            return status in RETRYABLE_STATUS_CODES
+
+    return bool(RETRYABLE_MESSAGE_PATTERN.search(str(error)))
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given zero-based retry attempt"""
+    ceiling = min(settings.RETRY_MAX_DELAY, settings.RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+def call_with_resilience(provider: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call a blocking provider function with retries, rate limiting and the provider's circuit breaker
+
+    Run it through run_provider_call so backoff and rate-limit queueing see the request deadline.
+    """
+    breaker = get_circuit_breaker(provider)
+    limiter = get_rate_limiter(provider)
+
+    last_error: Optional[Exception] = None
+    for attempt in range(settings.RETRY_MAX_ATTEMPTS):
+        # A caller that gave up on this thread at the deadline no longer wants the result
+        if deadline_expired():
+            raise DeadlineExceeded(f"{provider} call abandoned at the request deadline")
+        if not breaker.allow():
+            # A retry refused because the breaker just opened still reports the provider's own error
+            if last_error is not None:
+                raise last_error
+            raise CircuitOpenError(f"{provider} circuit is open; failing fast")
+        # Every attempt is a real request, so each one waits for its own token; only calls
+        # the breaker lets through spend shared rate-limit quota
+        if limiter:
+            try:
+                limiter.acquire()
+            except BaseException:
+                breaker.cancel()
+                raise
+        try:
+            with PROVIDER_REQUEST_SECONDS.time(provider=provider):
+                result = func(*args, **kwargs)
+        except Exception as e:
+            PROVIDER_REQUESTS.inc(provider=provider, outcome="error")
+            retryable = is_retryable(e)
+            breaker.record_failure(retryable)
+            delay = backoff_delay(attempt)
+            remaining: Optional[float] = time_remaining()
+            if (
+                not retryable
+                or attempt == settings.RETRY_MAX_ATTEMPTS - 1
+                or (remaining is not None and remaining <= delay)
+            ):
+                raise
+            breaker.record_retry()
+            last_error = e
+            logger.info(f"Retrying {provider} in {delay:.2f}s after: {str(e)}")
+            time.sleep(delay)
+        except BaseException:
+            # Cancelled or interrupted mid-call: give back the attempt so a half-open probe slot is freed
+            breaker.cancel()
+            raise
+        else:
+            PROVIDER_REQUESTS.inc(provider=provider, outcome="success")
+            breaker.record_success()
+            return result
+
+async def acall_with_resilience(provider: str, factory: Callable[[], Awaitable[T]]) -> T:
+    """Await a provider call with retries, rate limiting and the provider's circuit breaker
+
+    The factory is invoked once per attempt since a coroutine can only be awaited once.
+    Backoff and rate-limit queueing never wait past the current request deadline.
+    """
+    breaker = get_circuit_breaker(provider)
+    limiter = get_rate_limiter(provider)
+
+    last_error: Optional[Exception] = None
+    for attempt in range(settings.RETRY_MAX_ATTEMPTS):
+        # Only calls the breaker lets through spend shared rate-limit quota
+        if not breaker.allow():
+            # A retry refused because the breaker just opened still reports the provider's own error
+            if last_error is not None:
+                raise last_error
+            raise CircuitOpenError(f"{provider} circuit is open; failing fast")
+        if limiter:
+            try:
+                await limiter.aacquire()
+            except BaseException:
+                breaker.cancel()
+                raise
+        try:
+            with PROVIDER_REQUEST_SECONDS.time(provider=provider):
+                result = await factory()
+        except Exception as e:
+            PROVIDER_REQUESTS.inc(provider=provider, outcome="error")
+            retryable = is_retryable(e)
+            breaker.record_failure(retryable)
+            delay = backoff_delay(attempt)
+            remaining: Optional[float] = time_remaining()
+            if (
+                not retryable
+                or attempt == settings.RETRY_MAX_ATTEMPTS - 1
+                or (remaining is not None and remaining <= delay)
+            ):
+                raise
+            breaker.record_retry()
+            last_error = e
+            logger.info(f"Retrying {provider} in {delay:.2f}s after: {str(e)}")
+            await asyncio.sleep(delay)
+        except BaseException:
+            # Cancelled or interrupted mid-call: give back the attempt so a half-open probe slot is freed
+            breaker.cancel()
+            raise
+        else:
+            PROVIDER_REQUESTS.inc(provider=provider, outcome="success")
+            breaker.record_success()
+            return result
@@ -1,13 +1,29 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
 from app.api.routes import api_router
 from app.core.config import settings
+from app.services.registry import ServiceRegistry
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared services once so clients and connection pools are reused"""
+    services = ServiceRegistry()
+    services.warm_up()
+    app.state.services = services
+
+    job_service = services.job_service()
+    await job_service.start()
+    yield
+    await job_service.stop()
+    services.shutdown()
 
 app = FastAPI(
     title="AI Competitor Intelligence Platform",
     description="Multi-agent system for competitor analysis and intelligence",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
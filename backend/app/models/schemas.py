@@ -39,6 +39,23 @@ class ComparisonReport(BaseModel):
     recommendations: List[str]
     timestamp: datetime
 
+class ComparisonMatrixRequest(BaseModel):
+    company_urls: List[str]
+
+class PairwiseComparison(BaseModel):
+    company_a_url: str
+    company_b_url: str
+    report: Optional[ComparisonReport] = None
+    error: Optional[str] = None
+
+class ComparisonMatrixResponse(BaseModel):
+    companies: List[str]
+    reports: List[AnalysisReport]
+    comparisons: List[PairwiseComparison]
+    advantage_matrix: Dict[str, Dict[str, int]]  # row company -> column company -> features won
+    timestamp: datetime
+    partial: bool = False  # True when ANALYSIS_TIMEOUT cut the comparisons short
+
 class DiscoveryResponse(BaseModel):
     competitors: List[CompetitorInfo]
     total_found: int
@@ -48,8 +65,26 @@ class AnalysisResponse(BaseModel):
     reports: List[AnalysisReport]
     summary: str
     timestamp: datetime
+    partial: bool = False  # True when ANALYSIS_TIMEOUT cut the analysis short
 
 class ExportRequest(BaseModel):
     format: str  # "pdf" or "csv"
     data_type: str  # "analysis" or "comparison"
-    data: Dict[str, Any]
\ No newline at end of file
+    data: Dict[str, Any]
+
+class BulkExportRequest(BaseModel):
+    format: str  # "parquet" or "arrow"
+    data_type: str  # "analysis" or "comparison"
+    data: Optional[List[Dict[str, Any]]] = None  # payloads to export; defaults to completed job history
+    since: Optional[datetime] = None  # job history window start (inclusive)
+    until: Optional[datetime] = None  # job history window end (exclusive)
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str  # "analysis" or "comparison"
+    status: str  # "queued", "running", "completed" or "failed"
+    params: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
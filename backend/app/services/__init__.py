@@ -2,10 +2,14 @@ from .discovery_service import DiscoveryService
 from .analysis_service import AnalysisService
 from .comparison_service import ComparisonService
 from .export_service import ExportService
+from .job_service import JobService
+from .registry import ServiceRegistry
 
 __all__ = [
     "DiscoveryService",
     "AnalysisService",
     "ComparisonService",
-    "ExportService"
+    "ExportService",
+    "JobService",
+    "ServiceRegistry"
 ]
\ No newline at end of file
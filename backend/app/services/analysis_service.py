@@ -1,82 +1,206 @@
-from app.agents import AgentOrchestrator, FirecrawlAgent, AnalysisAgent
+from app.agents import AgentOrchestrator, FirecrawlAgent, AnalysisAgent, CrawlResult
 from app.models.schemas import AnalysisResponse, AnalysisReport, CompetitorInfo
-from typing import List
+from app.core.config import settings
+from app.core.deadline import request_deadline, deadline_expired
+from app.core.metrics import instrument_service, instrument_stream
+from typing import List, Optional, Dict, Any, AsyncIterator
 from datetime import datetime
 import asyncio
+import time
 
 class AnalysisService:
     """Service for coordinating competitor analysis using AI agents"""
 
-    def __init__(self):
+    # Analysis prompts only read markdown, so skip the much larger html payload
+    CRAWL_FORMATS = ["markdown"]
+
+    def __init__(self, firecrawl_agent: Optional[FirecrawlAgent] = None, analysis_agent: Optional[AnalysisAgent] = None):
         self.orchestrator = AgentOrchestrator()
 
-        # Register agents
-        self.firecrawl_agent = FirecrawlAgent()
-        self.analysis_agent = AnalysisAgent()
+        # Register agents, reusing shared instances when provided
+        self.firecrawl_agent = firecrawl_agent or FirecrawlAgent()
+        self.analysis_agent = analysis_agent or AnalysisAgent()
 
         self.orchestrator.register_agent(self.firecrawl_agent)
         self.orchestrator.register_agent(self.analysis_agent)
 
-    async def analyze_competitors(self, competitor_urls: List[str]) -> AnalysisResponse:
+    @instrument_service("analysis")
+    async def analyze_competitors(self, competitor_urls: List[str], bypass_cache: bool = False) -> AnalysisResponse:
         """Analyze a list of competitor URLs"""
+        if not competitor_urls:
+            raise Exception("No crawl results available for analysis")
 
-        # Define workflow for analysis
-        workflow = [
-            {
-                "agent": "firecrawl_agent",
-                "action": "crawl",
-                "params": {"urls": competitor_urls}
-            },
-            {
+        # Each group's analysis starts as soon as its own members are crawled, so small
+        # sites in a group can share one Gemini prompt without waiting for every crawl
+        semaphore = asyncio.Semaphore(settings.ANALYSIS_CONCURRENCY)
+        workflow = []
+        analyze_steps = []
+        url_index = 0
+        for group_index, group in enumerate(self._group_urls(competitor_urls)):
+            crawl_steps = []
+            for url in group:
+                crawl_steps.append(f"crawl_{url_index}")
+                url_index += 1
+                workflow.append({
+                    "id": crawl_steps[-1],
+                    "agent": "firecrawl_agent",
+                    "method": "crawl_url",
+                    "action": "crawl",
+                    "params": {"url": url, "formats": self.CRAWL_FORMATS, "bypass_cache": bypass_cache}
+                })
+            workflow.append({
+                "id": f"analyze_{group_index}",
                 "agent": "analysis_agent",
+                "method": "analyze_crawls",
                 "action": "analyze",
-                "params": {}  # Will use crawl results
-            }
-        ]
+                "params": {"semaphore": semaphore},
+                "inputs": {"data": crawl_steps}
+            })
+            analyze_steps.append(f"analyze_{group_index}")
 
-        # Execute crawling first
-        crawl_results = await self.firecrawl_agent.execute(urls=competitor_urls)
+        workflow.append({
+            "id": "summary",
+            "agent": "analysis_agent",
+            "method": "summarize",
+            "action": "summarize",
+            "inputs": {"analysis_groups": analyze_steps}
+        })
 
-        if not crawl_results.get("crawl_results"):
-            raise Exception("No crawl results available for analysis")
-
-        # Execute analysis with crawl data
-        analysis_results = await self.analysis_agent.execute(
-            crawl_data=crawl_results["crawl_results"]
-        )
+        with request_deadline(settings.ANALYSIS_TIMEOUT):
+            results = await self.orchestrator.execute_workflow(workflow)
+            partial = deadline_expired()
 
-        # Convert to response format
+        # Convert to response format; a failed or cancelled group records an error dict instead of a list
         reports = []
-        for analysis in analysis_results.get("competitor_analyses", []):
-            if not analysis.get("success"):
+        for step_id in analyze_steps:
+            group_results = results[step_id]
+            if not isinstance(group_results, list):
                 continue
+            reports.extend(self._build_report(analysis) for analysis in group_results if analysis.get("success"))
 
-            # Create competitor info from analysis
-            analysis_data = analysis["analysis"]
-            competitor_info = CompetitorInfo(
-                name=analysis_data.get("company_name", "Unknown"),
-                url=analysis["url"],
-                description=analysis_data.get("business_model", ""),
-                industry=analysis_data.get("industry", "Unknown"),
-                size=analysis_data.get("company_size", "Unknown")
-            )
-
-            # Create analysis report
-            report = AnalysisReport(
-                competitor=competitor_info,
-                strengths=analysis_data.get("strengths", []),
-                weaknesses=analysis_data.get("weaknesses", []),
-                pricing_strategy=analysis_data.get("pricing_strategy", {}),
-                market_position=analysis_data.get("market_position", "Unknown"),
-                growth_opportunities=analysis_data.get("growth_opportunities", []),
-                market_gaps=analysis_data.get("market_gaps", []),
-                key_differentiators=analysis_data.get("key_differentiators", []),
-                timestamp=datetime.now()
-            )
-            reports.append(report)
+        summary = results["summary"]
+        if not isinstance(summary, str):
+            summary = "Summary unavailable: analysis deadline exceeded" if partial else "Analysis completed"
 
         return AnalysisResponse(
             reports=reports,
-            summary=analysis_results.get("summary", "Analysis completed"),
+            summary=summary,
+            timestamp=datetime.now(),
+            partial=partial
+        )
+
+    @instrument_service("analysis")
+    async def build_reports(self, crawl_results: List[CrawlResult]) -> List[AnalysisReport]:
+        """Analyze already crawled companies without generating a market summary"""
+        if not crawl_results:
+            return []
+
+        analysis_results = await self.analysis_agent.execute(crawl_data=crawl_results, summarize=False)
+        return [
+            self._build_report(analysis)
+            for analysis in analysis_results.get("competitor_analyses", [])
+            if analysis.get("success")
+        ]
+
+    @instrument_stream("analysis")
+    async def stream_competitor_analyses(self, competitor_urls: List[str], bypass_cache: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """Yield competitor reports as soon as each one's analysis finishes, then the summary"""
+        semaphore = asyncio.Semaphore(settings.ANALYSIS_CONCURRENCY)
+        completed: asyncio.Queue = asyncio.Queue()
+        started = time.monotonic()
+        with request_deadline(settings.ANALYSIS_TIMEOUT):
+            # Tasks inherit the deadline, so every crawl and LLM call gives up when it passes
+            tasks = [
+                asyncio.ensure_future(self._crawl_and_analyze(group, semaphore, bypass_cache, completed))
+                for group in self._group_urls(competitor_urls)
+            ]
+
+        analysis_results = []
+        try:
+            # Every URL reports exactly once, whether analyzed, failed or given up on
+            for _ in competitor_urls:
+                analysis = await completed.get()
+                analysis_results.append(analysis)
+
+                if analysis.get("success"):
+                    yield {"type": "report", "data": self._build_report(analysis).model_dump(mode="json")}
+                else:
+                    yield {"type": "error", "url": analysis["url"], "error": analysis.get("error", "Unknown error")}
+
+            # The deadline cannot be held open across yields, so the summary gets what is left of it
+            with request_deadline(settings.ANALYSIS_TIMEOUT - (time.monotonic() - started)):
+                summary = await self.analysis_agent.summarize(analysis_results)
+                partial = deadline_expired()
+            yield {"type": "summary", "data": summary, "timestamp": datetime.now().isoformat(), "partial": partial}
+        finally:
+            # Stop outstanding work if the client goes away mid-stream
+            for task in tasks:
+                task.cancel()
+
+    def _group_urls(self, competitor_urls: List[str]) -> List[List[str]]:
+        """Split competitors into analysis groups, in input order, whose small sites may share a prompt"""
+        size = max(1, settings.ANALYSIS_BATCH_SIZE)
+        return [competitor_urls[i:i + size] for i in range(0, len(competitor_urls), size)]
+
+    async def _crawl_and_analyze(self, urls: List[str], semaphore: asyncio.Semaphore, bypass_cache: bool, completed: asyncio.Queue):
+        """Crawl one group of competitors and put each analysis on the queue as it finishes
+
+        Sites that need a prompt of their own are analyzed as soon as they are crawled; only the
+        small ones that share a prompt wait for the rest of the group's crawls.
+        """
+        reported = set()
+
+        async def analyze(batch: List[CrawlResult]):
+            for analysis in await self.analysis_agent.analyze_crawls(batch, semaphore):
+                reported.add(analysis["url"])
+                completed.put_nowait(analysis)
+
+        crawls = [
+            asyncio.ensure_future(self.firecrawl_agent.crawl_url(url, formats=self.CRAWL_FORMATS, bypass_cache=bypass_cache))
+            for url in urls
+        ]
+        analyses = []
+        try:
+            small_sites = []
+            for next_crawl in asyncio.as_completed(crawls):
+                crawl_result = await next_crawl
+                if self.analysis_agent.is_batchable(crawl_result):
+                    small_sites.append(crawl_result)
+                else:
+                    analyses.append(asyncio.ensure_future(analyze([crawl_result])))
+            if small_sites:
+                analyses.append(asyncio.ensure_future(analyze(small_sites)))
+            await asyncio.gather(*analyses)
+        except Exception as e:
+            # Unexpected failures still account for every URL so the stream does not wait on them
+            for url in urls:
+                if url not in reported:
+                    completed.put_nowait({"url": url, "error": str(e), "success": False})
+        finally:
+            for task in crawls + analyses:
+                task.cancel()
+
+    def _build_report(self, analysis: Dict[str, Any]) -> AnalysisReport:
+        """Convert a successful agent analysis into an AnalysisReport"""
+        # Create competitor info from analysis
+        analysis_data = analysis["analysis"]
+        competitor_info = CompetitorInfo(
+            name=analysis_data.get("company_name", "Unknown"),
+            url=analysis["url"],
+            description=analysis_data.get("business_model", ""),
+            industry=analysis_data.get("industry", "Unknown"),
+            size=analysis_data.get("company_size", "Unknown")
+        )
+
+        # Create analysis report
+        return AnalysisReport(
+            competitor=competitor_info,
+            strengths=analysis_data.get("strengths", []),
+            weaknesses=analysis_data.get("weaknesses", []),
+            pricing_strategy=analysis_data.get("pricing_strategy", {}),
+            market_position=analysis_data.get("market_position", "Unknown"),
+            growth_opportunities=analysis_data.get("growth_opportunities", []),
+            market_gaps=analysis_data.get("market_gaps", []),
+            key_differentiators=analysis_data.get("key_differentiators", []),
             timestamp=datetime.now()
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,184 @@
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime
+
+# format -> (file extension, media type)
+COLUMNAR_FORMATS = {
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrows", "application/vnd.apache.arrow.stream")
+}
+
+COMPETITOR_FIELDS = ["name", "url", "description", "industry", "size", "founded"]
+PRICING_FIELDS = ["model", "positioning", "transparency"]
+COMPARISON_ITEM_FIELDS = ["feature", "company_a", "company_b", "advantage"]
+ANALYSIS_LIST_FIELDS = ["strengths", "weaknesses", "key_differentiators", "growth_opportunities", "market_gaps"]
+
+# (source id, payload) pairs; the source id is the job id for exports of job history
+Payload = Tuple[Optional[str], Dict[str, Any]]
+
+class _ChunkSink:
+    """Write-only file object that buffers bytes until the response stream drains them"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        """Buffer bytes handed over by the pyarrow writer"""
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        """Total bytes written so far"""
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain"""
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_columnar(format: str, data_type: str, payloads: Iterable[Payload], row_group_size: int) -> Iterator[bytes]:
+    """Validate the request and return a generator of Parquet or Arrow IPC stream bytes"""
+    if format not in COLUMNAR_FORMATS:
+        raise ValueError("Unsupported bulk export format. Use 'parquet' or 'arrow'")
+    if data_type not in ("analysis", "comparison"):
+        raise ValueError("Unsupported data type for bulk export")
+
+    # Imported here so the rest of the export service works without pyarrow installed
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if data_type == "analysis":
+        schema = _analysis_schema(pa)
+        rows = _analysis_rows(payloads)
+    else:
+        schema = _comparison_schema(pa)
+        rows = _comparison_rows(payloads)
+
+    return _write_row_groups(pa, pq, format, schema, rows, row_group_size)
+
+def _write_row_groups(pa, pq, format: str, schema, rows: Iterator[Dict[str, Any]], row_group_size: int) -> Iterator[bytes]:
+    """Encode rows one row group at a time, yielding the bytes produced by each group"""
+    sink = _ChunkSink()
+    if format == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= row_group_size:
+                _write_batch(pa, writer, schema, batch, format)
+                batch = []
+                yield sink.drain()
+
+        if batch:
+            _write_batch(pa, writer, schema, batch, format)
+    finally:
+        writer.close()
+
+    yield sink.drain()
+
+def _write_batch(pa, writer, schema, batch: List[Dict[str, Any]], format: str):
+    """Write one row group"""
+    table = pa.Table.from_pylist(batch, schema=schema)
+    if format == "parquet":
+        writer.write_table(table, row_group_size=len(batch))
+    else:
+        writer.write_table(table)
+
+def _analysis_schema(pa):
+    """One row per competitor report"""
+    return pa.schema([
+        ("source_id", pa.string()),
+        ("analyzed_at", pa.timestamp("us")),
+        ("competitor", pa.struct([(field, pa.string()) for field in COMPETITOR_FIELDS])),
+        ("market_position", pa.string()),
+        ("pricing_strategy", pa.struct([(field, pa.string()) for field in PRICING_FIELDS])),
+        *[(field, pa.list_(pa.string())) for field in ANALYSIS_LIST_FIELDS],
+        ("summary", pa.string())
+    ])
+
+def _comparison_schema(pa):
+    """One row per two-company comparison"""
+    company = pa.struct([(field, pa.string()) for field in COMPETITOR_FIELDS])
+    return pa.schema([
+        ("source_id", pa.string()),
+        ("compared_at", pa.timestamp("us")),
+        ("company_a", company),
+        ("company_b", company),
+        ("feature_comparison", pa.list_(pa.struct([(field, pa.string()) for field in COMPARISON_ITEM_FIELDS]))),
+        ("overall_assessment", pa.string()),
+        ("recommendations", pa.list_(pa.string()))
+    ])
+
+def _analysis_rows(payloads: Iterable[Payload]) -> Iterator[Dict[str, Any]]:
+    """Flatten analysis responses into report rows"""
+    for source_id, payload in payloads:
+        for report in payload.get("reports", []):
+            row = {
+                "source_id": source_id,
+                "analyzed_at": _parse_timestamp(report.get("timestamp") or payload.get("timestamp")),
+                "competitor": _string_struct(report.get("competitor"), COMPETITOR_FIELDS),
+                "market_position": _string_or_none(report.get("market_position")),
+                "pricing_strategy": _string_struct(report.get("pricing_strategy"), PRICING_FIELDS),
+                "summary": _string_or_none(payload.get("summary"))
+            }
+            for field in ANALYSIS_LIST_FIELDS:
+                row[field] = _string_list(report.get(field))
+            yield row
+
+def _comparison_rows(payloads: Iterable[Payload]) -> Iterator[Dict[str, Any]]:
+    """Turn comparison reports into rows"""
+    for source_id, payload in payloads:
+        yield {
+            "source_id": source_id,
+            "compared_at": _parse_timestamp(payload.get("timestamp")),
+            "company_a": _string_struct(payload.get("company_a"), COMPETITOR_FIELDS),
+            "company_b": _string_struct(payload.get("company_b"), COMPETITOR_FIELDS),
+            "feature_comparison": [
+                _string_struct(item, COMPARISON_ITEM_FIELDS)
+                for item in payload.get("feature_comparison") or []
+                if isinstance(item, dict)
+            ],
+            "overall_assessment": _string_or_none(payload.get("overall_assessment")),
+            "recommendations": _string_list(payload.get("recommendations"))
+        }
+
+def _string_struct(value: Any, fields: List[str]) -> Optional[Dict[str, Optional[str]]]:
+    """Project a dict onto fixed string fields; model output is not guaranteed to be well typed"""
+    if not isinstance(value, dict):
+        return None
+    return {field: _string_or_none(value.get(field)) for field in fields}
+
+def _string_list(value: Any) -> List[str]:
+    """Coerce a list field to a list of strings"""
+    if not isinstance(value, list):
+        return []
+    return [str(item) for item in value if item is not None]
+
+def _string_or_none(value: Any) -> Optional[str]:
+    """Coerce a scalar to a string, keeping missing values null"""
+    return None if value is None else str(value)
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse the ISO timestamps stored in serialized reports"""
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
@@ -1,20 +1,63 @@
-from app.agents import FirecrawlAgent, ComparisonAgent
-from app.models.schemas import ComparisonReport, CompetitorInfo, ComparisonItem
-from typing import List
+from app.agents import FirecrawlAgent, ComparisonAgent, CrawlResult
+from app.models.schemas import (
+    ComparisonReport,
+    CompetitorInfo,
+    ComparisonItem,
+    ComparisonMatrixResponse,
+    PairwiseComparison
+)
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, request_deadline, deadline_expired
+from app.core.metrics import instrument_service
+from .analysis_service import AnalysisService
+from typing import List, Optional, Dict, Any
 from datetime import datetime
+from itertools import combinations
+import asyncio
 
 class ComparisonService:
     """Service for coordinating competitor comparisons"""
 
-    def __init__(self):
-        self.firecrawl_agent = FirecrawlAgent()
-        self.comparison_agent = ComparisonAgent()
-
-    async def compare_competitors(self, company_a_url: str, company_b_url: str) -> ComparisonReport:
-        """Compare two competitors side by side"""
-
+    # Comparison prompts only read markdown, so skip the much larger html payload
+    CRAWL_FORMATS = ["markdown"]
+
+    def __init__(
+        self,
+        firecrawl_agent: Optional[FirecrawlAgent] = None,
+        comparison_agent: Optional[ComparisonAgent] = None,
+        analysis_service: Optional[AnalysisService] = None
+    ):
+        self.firecrawl_agent = firecrawl_agent or FirecrawlAgent()
+        self.comparison_agent = comparison_agent or ComparisonAgent()
+        self._analysis_service = analysis_service
+
+    @property
+    def analysis_service(self) -> AnalysisService:
+        """Analysis service used for per-company reports, created on first use"""
+        if self._analysis_service is None:
+            self._analysis_service = AnalysisService(firecrawl_agent=self.firecrawl_agent)
+        return self._analysis_service
+
+    @instrument_service("comparison")
+    async def compare_competitors(self, company_a_url: str, company_b_url: str, bypass_cache: bool = False) -> ComparisonReport:
+        """Compare two competitors side by side, giving up once ANALYSIS_TIMEOUT passes"""
+        with request_deadline(settings.ANALYSIS_TIMEOUT):
+            try:
+                return await self._compare_two(company_a_url, company_b_url, bypass_cache)
+            except Exception:
+                # Crawl and LLM failures caused by the deadline surface as a timeout, not a generic error
+                if deadline_expired():
+                    raise DeadlineExceeded("Comparison did not finish before the analysis deadline")
+                raise
+
+    async def _compare_two(self, company_a_url: str, company_b_url: str, bypass_cache: bool) -> ComparisonReport:
+        """Crawl and compare two companies"""
         # Crawl both companies
-        crawl_results = await self.firecrawl_agent.execute(urls=[company_a_url, company_b_url])
+        crawl_results = await self.firecrawl_agent.execute(
+            urls=[company_a_url, company_b_url],
+            formats=self.CRAWL_FORMATS,
+            bypass_cache=bypass_cache
+        )
 
         if len(crawl_results.get("crawl_results", [])) < 2:
             raise Exception("Failed to crawl both companies for comparison")
@@ -23,9 +66,9 @@ class ComparisonService:
         company_b_data = None
 
         for result in crawl_results["crawl_results"]:
-            if result["url"] == company_a_url and result["success"]:
+            if result.url == company_a_url and result.success:
                 company_a_data = result
-            elif result["url"] == company_b_url and result["success"]:
+            elif result.url == company_b_url and result.success:
                 company_b_data = result
 
         if not company_a_data or not company_b_data:
@@ -40,8 +83,98 @@ class ComparisonService:
         if not comparison_results.get("success"):
             raise Exception(f"Comparison failed: {comparison_results.get('error')}")
 
-        comparison_data = comparison_results["comparison"]
+        return self._build_report(comparison_results["comparison"])
+
+    @instrument_service("comparison")
+    async def compare_matrix(self, company_urls: List[str], bypass_cache: bool = False) -> ComparisonMatrixResponse:
+        """Compare every pair of companies, crawling each company only once and analyzing it alongside the pairs"""
+        # Deduplicate while keeping order so (A, B) and (B, A) collapse to one pair
+        urls = list(dict.fromkeys(company_urls))
+        if len(urls) < 2:
+            raise ValueError("At least two distinct companies are required for a comparison matrix")
+
+        # Work still outstanding at the deadline fails fast, leaving whatever completed
+        with request_deadline(settings.ANALYSIS_TIMEOUT):
+            crawl_results = await self.firecrawl_agent.execute(
+                urls=urls,
+                formats=self.CRAWL_FORMATS,
+                bypass_cache=bypass_cache
+            )
+            crawled = {result.url: result for result in crawl_results["crawl_results"] if result.success}
+
+            # Pairwise prompts read the crawled pages, not the per-company reports, so both run at once
+            semaphore = asyncio.Semaphore(settings.ANALYSIS_CONCURRENCY)
+            pairs = list(combinations(urls, 2))
+            reports, comparisons = await asyncio.gather(
+                self.analysis_service.build_reports(list(crawled.values())),
+                asyncio.gather(*(
+                    self._compare_pair(crawled.get(url_a), crawled.get(url_b), url_a, url_b, semaphore)
+                    for url_a, url_b in pairs
+                ))
+            )
+            partial = deadline_expired()
+
+        return ComparisonMatrixResponse(
+            companies=urls,
+            reports=reports,
+            comparisons=comparisons,
+            advantage_matrix=self._build_advantage_matrix(urls, comparisons),
+            timestamp=datetime.now(),
+            partial=partial
+        )
+
+    async def _compare_pair(
+        self,
+        company_a_data: Optional[CrawlResult],
+        company_b_data: Optional[CrawlResult],
+        company_a_url: str,
+        company_b_url: str,
+        semaphore: asyncio.Semaphore
+    ) -> PairwiseComparison:
+        """Run one pairwise comparison from already crawled data"""
+        if not company_a_data or not company_b_data:
+            return PairwiseComparison(
+                company_a_url=company_a_url,
+                company_b_url=company_b_url,
+                error="Failed to successfully crawl both companies"
+            )
+
+        async with semaphore:
+            comparison_results = await self.comparison_agent.execute(
+                company_a_data=company_a_data,
+                company_b_data=company_b_data
+            )
+
+        if not comparison_results.get("success"):
+            return PairwiseComparison(
+                company_a_url=company_a_url,
+                company_b_url=company_b_url,
+                error=f"Comparison failed: {comparison_results.get('error')}"
+            )
+
+        return PairwiseComparison(
+            company_a_url=company_a_url,
+            company_b_url=company_b_url,
+            report=self._build_report(comparison_results["comparison"])
+        )
+
+    def _build_advantage_matrix(self, urls: List[str], comparisons: List[PairwiseComparison]) -> Dict[str, Dict[str, int]]:
+        """Count, for each row company, the features where it beat each column company"""
+        matrix = {row: {column: 0 for column in urls if column != row} for row in urls}
+
+        for comparison in comparisons:
+            if not comparison.report:
+                continue
+            for item in comparison.report.feature_comparison:
+                if item.advantage == "company_a":
+                    matrix[comparison.company_a_url][comparison.company_b_url] += 1
+                elif item.advantage == "company_b":
+                    matrix[comparison.company_b_url][comparison.company_a_url] += 1
+
+        return matrix
 
+    def _build_report(self, comparison_data: Dict[str, Any]) -> ComparisonReport:
+        """Convert the agent's comparison into a ComparisonReport"""
         # Convert to response format
         company_a_info = CompetitorInfo(
             name=comparison_data["company_a"]["name"],
@@ -2,12 +2,36 @@ from exa_py import Exa
 from duckduckgo_search import DDGS
 from app.core.config import settings
 from app.models.schemas import CompetitorInfo, DiscoveryResponse
-from typing import List, Dict, Any
+from app.core.cache import PersistentCache
+from app.core.deadline import request_deadline
+from app.core.resilience import call_with_resilience, run_provider_call
+from app.core.metrics import DISCOVERY_PROVIDER_REQUESTS, DISCOVERY_PROVIDER_SECONDS, instrument_service
+from typing import List, Dict, Any, Awaitable, Callable, Optional, Tuple, Set
 from datetime import datetime
 import asyncio
 import re
+import time
 from urllib.parse import urlparse
 
+# Second-level suffixes under which the registrable domain has three labels
+MULTI_PART_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "com.au", "net.au", "co.nz", "co.jp", "co.in",
+    "com.br", "com.mx", "com.sg", "com.cn", "co.za", "com.tr", "co.kr", "com.hk"
+}
+
+# Review sites, directories and publishers that list companies rather than being one
+AGGREGATOR_DOMAINS = {
+    "g2.com", "capterra.com", "getapp.com", "softwareadvice.com", "trustradius.com",
+    "alternativeto.net", "producthunt.com", "saasworthy.com", "slant.co", "sourceforge.net",
+    "crunchbase.com", "medium.com", "reddit.com", "quora.com", "youtube.com", "forbes.com",
+    "techcrunch.com", "gartner.com", "trustpilot.com"
+}
+
+# Titles and paths such as "Top 10 Foo Alternatives" or "/foo-vs-bar"
+LISTICLE_PATTERN = re.compile(
+    r"\b(top|best)\s+\d+\b|\b\d+\s+best\b|\balternatives?\b|\bcompetitors\b|\bvs\.?\s|\bversus\b|\breviews?\b|\bcomparison\b"
+)
+
 class DiscoveryService:
     """Service for discovering competitors using Exa AI and DuckDuckGo"""
 
@@ -16,15 +40,27 @@ class DiscoveryService:
             self.exa_client = Exa(api_key=settings.EXA_API_KEY)
         else:
             self.exa_client = None
-        self.ddg = DDGS()
 
+        # Per-provider latency and outcome counters
+        self.provider_stats: Dict[str, Dict[str, Any]] = {}
+
+        if settings.DISCOVERY_CACHE_ENABLED:
+            self.cache = PersistentCache(
+                namespace="discovery",
+                ttl=settings.DISCOVERY_CACHE_TTL,
+                max_bytes=settings.DISCOVERY_CACHE_MAX_BYTES
+            )
+        else:
+            self.cache = None
+
+    @instrument_service("discovery")
     async def discover_competitors(self, input_type: str, input_value: str) -> DiscoveryResponse:
         """Main method to discover competitors"""
 
         if input_type == "url":
-            competitors = await self._discover_by_url(input_value)
+            competitors = await self._discover_by_url(input_value.strip())
         elif input_type == "description":
-            competitors = await self._discover_by_description(input_value)
+            competitors = await self._discover_by_description(input_value.strip())
         else:
             raise ValueError("Invalid input_type. Must be 'url' or 'description'")
 
@@ -40,78 +76,166 @@ class DiscoveryService:
 
     async def _discover_by_url(self, url: str) -> List[CompetitorInfo]:
         """Discover competitors based on a company URL"""
-        competitors = []
+        # Extract domain and company name for search
+        domain = urlparse(url).netloc.replace("www.", "")
+        company_name = domain.split(".")[0]
 
+        providers = {}
         # Use Exa to find similar companies
         if self.exa_client:
-            try:
-                exa_competitors = await self._exa_find_similar(url)
-                competitors.extend(exa_competitors)
-            except Exception as e:
-                print(f"Exa discovery failed: {str(e)}")
-
+            providers["exa"] = lambda: self._exa_find_similar(url)
         # Use DuckDuckGo for broader search
-        try:
-            # Extract domain and company name for search
-            domain = urlparse(url).netloc.replace("www.", "")
-            company_name = domain.split(".")[0]
+        providers["duckduckgo"] = lambda: self._ddg_find_competitors(f"{company_name} competitors alternatives")
 
-            ddg_competitors = await self._ddg_find_competitors(f"{company_name} competitors alternatives")
-            competitors.extend(ddg_competitors)
-        except Exception as e:
-            print(f"DuckDuckGo discovery failed: {str(e)}")
-
-        return competitors
+        return await self._query_providers(providers, ("url", self._normalize_url(url)))
 
     async def _discover_by_description(self, description: str) -> List[CompetitorInfo]:
         """Discover competitors based on a business description"""
-        competitors = []
-
+        providers = {}
         # Use Exa to find companies matching the description
         if self.exa_client:
-            try:
-                exa_competitors = await self._exa_search_by_description(description)
-                competitors.extend(exa_competitors)
-            except Exception as e:
-                print(f"Exa description search failed: {str(e)}")
-
+            providers["exa"] = lambda: self._exa_search_by_description(description)
         # Use DuckDuckGo for broader search
-        try:
-            search_query = f"{description} companies startups software"
-            ddg_competitors = await self._ddg_find_competitors(search_query)
-            competitors.extend(ddg_competitors)
-        except Exception as e:
-            print(f"DuckDuckGo description search failed: {str(e)}")
+        providers["duckduckgo"] = lambda: self._ddg_find_competitors(f"{description} companies startups software")
 
-        return competitors
+        return await self._query_providers(providers, ("description", self._normalize_description(description)))
 
-    async def _exa_find_similar(self, url: str) -> List[CompetitorInfo]:
-        """Use Exa to find similar companies"""
-        try:
-            # Run in executor to avoid blocking
-            search_results = await asyncio.get_event_loop().run_in_executor(
-                None, self._exa_similar_sync, url
-            )
+    async def _query_providers(
+        self,
+        providers: Dict[str, Callable[[], Awaitable[List[CompetitorInfo]]]],
+        cache_scope: Tuple[str, str]
+    ) -> List[CompetitorInfo]:
+        """Query all providers concurrently and merge whatever returned before the deadline"""
+        results = await asyncio.gather(*(
+            self._query_provider(name, query, cache_scope) for name, query in providers.items()
+        ))
+
+        # Merge in provider order so Exa results keep priority during deduplication
+        competitors = []
+        for provider_results in results:
+            competitors.extend(provider_results)
+        return competitors
 
-            competitors = []
-            for result in search_results.results[:5]:  # Limit Exa results
-                competitor = CompetitorInfo(
-                    name=self._extract_company_name(result.title),
-                    url=result.url,
-                    description=result.text[:200] if result.text else "",
-                    industry="Unknown",
-                    size="Unknown"
-                )
-                competitors.append(competitor)
+    async def _query_provider(
+        self,
+        name: str,
+        query: Callable[[], Awaitable[List[CompetitorInfo]]],
+        cache_scope: Tuple[str, str]
+    ) -> List[CompetitorInfo]:
+        """Run one provider query under the discovery deadline, serving repeats from the cache"""
+        stats = self.provider_stats.setdefault(name, {
+            "requests": 0,
+            "successes": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "cache_hits": 0,
+            "total_latency": 0.0,
+            "last_latency": 0.0
+        })
+
+        cache_key = PersistentCache.make_key(*cache_scope, name)
+        cached = await self._get_cached_results(cache_key)
+        if cached is not None:
+            stats["cache_hits"] += 1
+            DISCOVERY_PROVIDER_REQUESTS.inc(provider=name, outcome="cache_hit")
+            return cached
+
+        stats["requests"] += 1
+        started = time.monotonic()
 
+        try:
+            # The deadline also reaches provider threads, so abandoned queries stop retrying
+            with request_deadline(settings.DISCOVERY_PROVIDER_TIMEOUT):
+                competitors = await asyncio.wait_for(query(), timeout=settings.DISCOVERY_PROVIDER_TIMEOUT)
+            stats["successes"] += 1
+            DISCOVERY_PROVIDER_REQUESTS.inc(provider=name, outcome="success")
+            await self._cache_results(cache_key, competitors)
             return competitors
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            DISCOVERY_PROVIDER_REQUESTS.inc(provider=name, outcome="timeout")
+            print(f"{name} discovery timed out after {settings.DISCOVERY_PROVIDER_TIMEOUT}s")
+            return []
         except Exception as e:
-            print(f"Exa similar search error: {str(e)}")
+            stats["failures"] += 1
+            DISCOVERY_PROVIDER_REQUESTS.inc(provider=name, outcome="failure")
+            print(f"{name} discovery failed: {str(e)}")
             return []
+        finally:
+            latency = time.monotonic() - started
+            stats["total_latency"] += latency
+            stats["last_latency"] = latency
+            DISCOVERY_PROVIDER_SECONDS.observe(latency, provider=name)
+
+    async def _get_cached_results(self, cache_key: str) -> Optional[List[CompetitorInfo]]:
+        """Load raw provider results stored for an identical discovery input"""
+        if not self.cache:
+            return None
+        try:
+            cached = await self.cache.aget(cache_key)
+        except Exception as e:
+            print(f"Discovery cache lookup failed: {str(e)}")
+            return None
+        if cached is None:
+            return None
+        return [CompetitorInfo(**competitor) for competitor in cached]
+
+    async def _cache_results(self, cache_key: str, competitors: List[CompetitorInfo]):
+        """Store raw provider results; deduplication and limits are applied on read"""
+        if not self.cache:
+            return
+        try:
+            await self.cache.aset(cache_key, [competitor.model_dump() for competitor in competitors])
+        except Exception as e:
+            print(f"Failed to cache discovery results: {str(e)}")
+
+    def _normalize_url(self, url: str) -> str:
+        """Normalize a company URL so equivalent inputs share cache entries"""
+        parsed = urlparse(url if "://" in url else f"https://{url}")
+        host = parsed.netloc.lower()
+        if host.startswith("www."):
+            host = host[4:]
+        return f"{host}{parsed.path.rstrip('/')}"
+
+    def _normalize_description(self, description: str) -> str:
+        """Normalize a business description for cache lookups"""
+        return " ".join(description.lower().split())
+
+    def get_provider_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider request counts, success rate and latency"""
+        metrics = {}
+        for name, stats in self.provider_stats.items():
+            requests = stats["requests"]
+            metrics[name] = {
+                **stats,
+                "success_rate": stats["successes"] / requests if requests else 0.0,
+                "average_latency": stats["total_latency"] / requests if requests else 0.0
+            }
+        return metrics
+
+    async def _exa_find_similar(self, url: str) -> List[CompetitorInfo]:
+        """Use Exa to find similar companies"""
+        # Run on the provider executor to avoid blocking
+        search_results = await run_provider_call(self._exa_similar_sync, url)
+
+        competitors = []
+        for result in search_results.results[:5]:  # Limit Exa results
+            competitor = CompetitorInfo(
+                name=self._extract_company_name(result.title),
+                url=result.url,
+                description=result.text[:200] if result.text else "",
+                industry="Unknown",
+                size="Unknown"
+            )
+            competitors.append(competitor)
+
+        return competitors
 
     def _exa_similar_sync(self, url: str):
         """Synchronous Exa similar search"""
-        return self.exa_client.find_similar(
+        return call_with_resilience(
+            "exa",
+            self.exa_client.find_similar,
             url=url,
             num_results=5,
             include_domains=[],
@@ -120,33 +244,29 @@ class DiscoveryService:
 
     async def _exa_search_by_description(self, description: str) -> List[CompetitorInfo]:
         """Use Exa to search by business description"""
-        try:
-            # Create a search query from the description
-            search_query = f"companies that {description}"
+        # Create a search query from the description
+        search_query = f"companies that {description}"
 
-            search_results = await asyncio.get_event_loop().run_in_executor(
-                None, self._exa_search_sync, search_query
-            )
+        search_results = await run_provider_call(self._exa_search_sync, search_query)
 
-            competitors = []
-            for result in search_results.results[:5]:  # Limit Exa results
-                competitor = CompetitorInfo(
-                    name=self._extract_company_name(result.title),
-                    url=result.url,
-                    description=result.text[:200] if result.text else "",
-                    industry="Unknown",
-                    size="Unknown"
-                )
-                competitors.append(competitor)
+        competitors = []
+        for result in search_results.results[:5]:  # Limit Exa results
+            competitor = CompetitorInfo(
+                name=self._extract_company_name(result.title),
+                url=result.url,
+                description=result.text[:200] if result.text else "",
+                industry="Unknown",
+                size="Unknown"
+            )
+            competitors.append(competitor)
 
-            return competitors
-        except Exception as e:
-            print(f"Exa description search error: {str(e)}")
-            return []
+        return competitors
 
     def _exa_search_sync(self, query: str):
         """Synchronous Exa search"""
-        return self.exa_client.search(
+        return call_with_resilience(
+            "exa",
+            self.exa_client.search,
             query=query,
             num_results=5,
             include_domains=[],
@@ -155,35 +275,31 @@ class DiscoveryService:
 
     async def _ddg_find_competitors(self, query: str) -> List[CompetitorInfo]:
         """Use DuckDuckGo to find competitors"""
-        try:
-            # Run in executor to avoid blocking
-            search_results = await asyncio.get_event_loop().run_in_executor(
-                None, self._ddg_search_sync, query
-            )
+        # Run on the provider executor to avoid blocking
+        search_results = await run_provider_call(self._ddg_search_sync, query)
 
-            competitors = []
-            for result in search_results[:8]:  # Limit DDG results
-                # Skip certain domains
-                if any(domain in result["href"] for domain in ["wikipedia.org", "linkedin.com", "facebook.com", "twitter.com"]):
-                    continue
-
-                competitor = CompetitorInfo(
-                    name=self._extract_company_name(result["title"]),
-                    url=result["href"],
-                    description=result["body"][:200] if result.get("body") else "",
-                    industry="Unknown",
-                    size="Unknown"
-                )
-                competitors.append(competitor)
+        competitors = []
+        for result in search_results[:8]:  # Limit DDG results
+            # Skip certain domains
+            if any(domain in result["href"] for domain in ["wikipedia.org", "linkedin.com", "facebook.com", "twitter.com"]):
+                continue
 
-            return competitors
-        except Exception as e:
-            print(f"DuckDuckGo search error: {str(e)}")
-            return []
+            competitor = CompetitorInfo(
+                name=self._extract_company_name(result["title"]),
+                url=result["href"],
+                description=result["body"][:200] if result.get("body") else "",
+                industry="Unknown",
+                size="Unknown"
+            )
+            competitors.append(competitor)
+
+        return competitors
 
     def _ddg_search_sync(self, query: str) -> List[Dict[str, Any]]:
         """Synchronous DuckDuckGo search"""
-        return list(self.ddg.text(query, max_results=10))
+        # DDGS keeps per-session state, so each search gets its own client and concurrent searches do not serialize
+        with DDGS() as ddgs:
+            return list(ddgs.text(query, max_results=10))
 
     def _extract_company_name(self, title: str) -> str:
         """Extract company name from title"""
@@ -201,18 +317,70 @@ class DiscoveryService:
         return title.strip()
 
     def _deduplicate_competitors(self, competitors: List[CompetitorInfo]) -> List[CompetitorInfo]:
-        """Remove duplicate competitors based on URL domain"""
-        seen_domains = set()
+        """Remove aggregator/listicle pages and competitors that duplicate an earlier one"""
         unique_competitors = []
+        seen_shingles: List[Set[str]] = []
+        seen_domains = set()
+        seen_brands = set()
+        seen_names = set()
 
         for competitor in competitors:
             try:
-                domain = urlparse(competitor.url).netloc.lower().replace("www.", "")
-                if domain not in seen_domains and domain:
-                    seen_domains.add(domain)
-                    unique_competitors.append(competitor)
+                parsed = urlparse(competitor.url)
             except Exception:
                 # Skip malformed URLs
                 continue
 
-        return unique_competitors
\ No newline at end of file
+            host = parsed.netloc.lower().split(":")[0]
+            if host.startswith("www."):
+                host = host[4:]
+            if not host or self._is_aggregator(host, parsed.path, competitor.name):
+                continue
+
+            domain = self._registrable_domain(host)
+            brand = domain.split(".")[0]
+            name = re.sub(r"[^a-z0-9]", "", competitor.name.lower())
+            shingles = self._shingles(competitor.description)
+
+            # app.foo.com / foo.io / "Foo" all collapse onto the first Foo seen
+            if domain in seen_domains or brand in seen_brands or (name and name in seen_names):
+                continue
+            if shingles and any(
+                self._jaccard(shingles, other) >= settings.DEDUP_SIMILARITY_THRESHOLD
+                for other in seen_shingles
+            ):
+                continue
+
+            seen_domains.add(domain)
+            seen_brands.add(brand)
+            if name:
+                seen_names.add(name)
+            seen_shingles.append(shingles)
+            unique_competitors.append(competitor)
+
+        return unique_competitors
+
+    def _registrable_domain(self, host: str) -> str:
+        """Approximate the registrable domain (e.g. foo.co.uk for app.foo.co.uk)"""
+        labels = host.split(".")
+        if len(labels) > 2 and ".".join(labels[-2:]) in MULTI_PART_SUFFIXES:
+            return ".".join(labels[-3:])
+        return ".".join(labels[-2:])
+
+    def _is_aggregator(self, host: str, path: str, name: str) -> bool:
+        """Detect review sites, directories and "top N alternatives" listicles"""
+        domain = self._registrable_domain(host)
+        if domain in AGGREGATOR_DOMAINS:
+            return True
+        return bool(LISTICLE_PATTERN.search(name.lower()) or LISTICLE_PATTERN.search(path.lower().replace("-", " ")))
+
+    def _shingles(self, text: str) -> Set[str]:
+        """Word 3-shingles of a description, used for near-duplicate detection"""
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+    def _jaccard(self, a: Set[str], b: Set[str]) -> float:
+        """Jaccard similarity of two shingle sets"""
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
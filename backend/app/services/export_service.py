@@ -1,36 +1,157 @@
-import pandas as pd
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from typing import Dict, Any
+from app.core.config import settings
+from app.core.cache import ArtifactCache, PersistentCache
+from app.core.metrics import instrument_service, instrument_stream
+from .columnar_export import stream_columnar
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import asyncio
+import csv
+import io
 import tempfile
 import os
 from datetime import datetime
 
+ANALYSIS_CSV_HEADER = [
+    "Company Name", "URL", "Industry", "Market Position", "Strengths", "Weaknesses",
+    "Key Differentiators", "Growth Opportunities", "Market Gaps"
+]
+PRICING_CSV_HEADER = ["Pricing Model", "Pricing Positioning", "Pricing Transparency"]
+COMPARISON_CSV_HEADER = ["Metric", "Company A", "Company B", "Advantage"]
+
+# Rows buffered per chunk handed to the response stream
+CSV_CHUNK_ROWS = 200
+
+class ExportQueueFullError(Exception):
+    """Raised when the export worker pool already has its maximum of queued jobs"""
+
+_process_export_service = None
+
+def _render_in_worker(method: str, *args: Any) -> str:
+    """Entry point for pool workers; reuses one ExportService (and stylesheet) per process"""
+    global _process_export_service
+    if _process_export_service is None:
+        _process_export_service = ExportService(use_artifact_cache=False)
+    return getattr(_process_export_service, method)(*args)
+
 class ExportService:
     """Service for exporting analysis and comparison reports"""
 
-    def __init__(self):
+    def __init__(self, use_artifact_cache: bool = True):
         self.styles = getSampleStyleSheet()
-
+        self._pdf_pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.artifact_cache: Optional[ArtifactCache] = None
+        if use_artifact_cache and settings.EXPORT_CACHE_ENABLED:
+            self.artifact_cache = ArtifactCache(
+                settings.EXPORT_CACHE_DIR,
+                ttl=settings.EXPORT_CACHE_TTL,
+                max_bytes=settings.EXPORT_CACHE_MAX_BYTES
+            )
+            self.artifact_cache.cleanup()
+
+    @instrument_service("export")
     async def export_data(self, format: str, data_type: str, data: Dict[str, Any]) -> str:
-        """Export data in the specified format"""
+        """Export data as a file in the specified format; CSV is served by stream_csv instead"""
         if format.lower() == "pdf":
             return await self._export_pdf(data_type, data)
-        elif format.lower() == "csv":
-            return await self._export_csv(data_type, data)
         else:
             raise ValueError("Unsupported export format. Use 'pdf' or 'csv'")
 
+    @instrument_stream("export")
+    def stream_csv(self, data_type: str, data: Dict[str, Any]) -> Iterator[str]:
+        """Validate the request and return a generator of CSV text chunks"""
+        if data_type == "analysis":
+            header = self._analysis_csv_header(data)
+            rows = self._analysis_csv_rows(data)
+        elif data_type == "comparison":
+            header = COMPARISON_CSV_HEADER
+            rows = self._comparison_csv_rows(data)
+        else:
+            raise ValueError("Unsupported data type for CSV export")
+
+        return self._write_csv(header, rows)
+
+    @instrument_stream("export")
+    def stream_columnar(
+        self,
+        format: str,
+        data_type: str,
+        payloads: Iterable[Tuple[Optional[str], Dict[str, Any]]]
+    ) -> Iterator[bytes]:
+        """Stream many analyses or comparisons as one Parquet file or Arrow IPC stream"""
+        return stream_columnar(format, data_type, payloads, settings.EXPORT_BULK_ROW_GROUP_SIZE)
+
+    def release(self, path: str):
+        """Delete an exported file once served, unless the artifact cache owns it"""
+        if self.artifact_cache is None:
+            os.remove(path)
+
+    def shutdown(self):
+        """Stop the PDF worker pool"""
+        if self._pdf_pool:
+            self._pdf_pool.shutdown(wait=False, cancel_futures=True)
+            self._pdf_pool = None
+
     async def _export_pdf(self, data_type: str, data: Dict[str, Any]) -> str:
-        """Export data as PDF"""
-        # Create temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        temp_file.close()
+        """Export data as PDF, served from the artifact cache when the same payload was rendered before"""
+        if self.artifact_cache is None:
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
+            temp_file.close()
+            return await self._render_pdf_in_pool(data_type, data, temp_file.name)
+
+        key = PersistentCache.make_key("pdf", data_type, data)
+        cached = await asyncio.get_event_loop().run_in_executor(None, self.artifact_cache.get, key, "pdf")
+        if cached:
+            return cached
+
+        # Identical exports requested concurrently share one render
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render_cached_pdf(key, data_type, data))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _render_cached_pdf(self, key: str, data_type: str, data: Dict[str, Any]) -> str:
+        """Render a PDF into the artifact cache and publish it under its content key"""
+        partial_path = self.artifact_cache.partial_path_for(key, "pdf")
+        try:
+            await self._render_pdf_in_pool(data_type, data, partial_path)
+        except Exception:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        return await asyncio.get_event_loop().run_in_executor(
+            None, self.artifact_cache.publish, key, "pdf", partial_path
+        )
 
-        doc = SimpleDocTemplate(temp_file.name, pagesize=A4)
+    async def _render_pdf_in_pool(self, data_type: str, data: Dict[str, Any], path: str) -> str:
+        """Lay out the PDF in a worker process since reportlab is CPU-bound"""
+        if self._pdf_pool is None:
+            self._pdf_pool = ProcessPoolExecutor(max_workers=settings.EXPORT_WORKERS)
+        return await self._run_in_pool(self._pdf_pool, "_render_pdf", data_type, data, path)
+
+    async def _run_in_pool(self, pool, method: str, *args: Any) -> str:
+        """Submit a render job, rejecting it if the running plus queued limit is reached"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(settings.EXPORT_WORKERS + settings.EXPORT_QUEUE_LIMIT)
+        if self._slots.locked():
+            raise ExportQueueFullError("Export queue is full, please retry shortly")
+
+        async with self._slots:
+            return await asyncio.get_event_loop().run_in_executor(
+                pool, _render_in_worker, method, *args
+            )
+
+    def _render_pdf(self, data_type: str, data: Dict[str, Any], path: str) -> str:
+        """Render data as a PDF file at the given path"""
+        doc = SimpleDocTemplate(path, pagesize=A4)
         story = []
 
         # Title
@@ -56,23 +177,7 @@ class ExportService:
         story.append(Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", self.styles['Normal']))
 
         doc.build(story)
-        return temp_file.name
-
-    async def _export_csv(self, data_type: str, data: Dict[str, Any]) -> str:
-        """Export data as CSV"""
-        # Create temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
-        temp_file.close()
-
-        if data_type == "analysis":
-            df = self._create_analysis_dataframe(data)
-        elif data_type == "comparison":
-            df = self._create_comparison_dataframe(data)
-        else:
-            raise ValueError("Unsupported data type for CSV export")
-
-        df.to_csv(temp_file.name, index=False)
-        return temp_file.name
+        return path
 
     def _add_analysis_content_to_pdf(self, story: list, data: Dict[str, Any]):
         """Add analysis content to PDF story"""
@@ -164,58 +269,70 @@ class ExportService:
             for rec in data["recommendations"]:
                 story.append(Paragraph(f"• {rec}", self.styles['Normal']))
 
-    def _create_analysis_dataframe(self, data: Dict[str, Any]) -> pd.DataFrame:
-        """Create DataFrame from analysis data"""
-        rows = []
+    def _write_csv(self, header: List[str], rows: Iterator[List[Any]]) -> Iterator[str]:
+        """Serialize rows to CSV, yielding a chunk every CSV_CHUNK_ROWS rows"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(header)
+
+        for count, row in enumerate(rows, start=1):
+            writer.writerow(row)
+            if count % CSV_CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    def _analysis_csv_header(self, data: Dict[str, Any]) -> List[str]:
+        """Analysis columns, with pricing columns only when some report has a pricing strategy"""
+        if any(report.get("pricing_strategy") for report in data.get("reports", [])):
+            return ANALYSIS_CSV_HEADER + PRICING_CSV_HEADER
+        return ANALYSIS_CSV_HEADER
+
+    def _analysis_csv_rows(self, data: Dict[str, Any]) -> Iterator[List[Any]]:
+        """Yield one flattened row per competitor report"""
+        include_pricing = len(self._analysis_csv_header(data)) > len(ANALYSIS_CSV_HEADER)
 
         for report in data.get("reports", []):
             competitor = report["competitor"]
 
-            # Create a row with flattened data
-            row = {
-                "Company Name": competitor["name"],
-                "URL": competitor["url"],
-                "Industry": competitor["industry"],
-                "Market Position": report.get("market_position", ""),
-                "Strengths": "; ".join(report.get("strengths", [])),
-                "Weaknesses": "; ".join(report.get("weaknesses", [])),
-                "Key Differentiators": "; ".join(report.get("key_differentiators", [])),
-                "Growth Opportunities": "; ".join(report.get("growth_opportunities", [])),
-                "Market Gaps": "; ".join(report.get("market_gaps", []))
-            }
-
-            # Add pricing strategy if available
-            pricing = report.get("pricing_strategy", {})
-            if pricing:
-                row["Pricing Model"] = pricing.get("model", "")
-                row["Pricing Positioning"] = pricing.get("positioning", "")
-                row["Pricing Transparency"] = pricing.get("transparency", "")
-
-            rows.append(row)
-
-        return pd.DataFrame(rows)
-
-    def _create_comparison_dataframe(self, data: Dict[str, Any]) -> pd.DataFrame:
-        """Create DataFrame from comparison data"""
-        rows = []
-
-        # Basic company info
-        basic_row = {
-            "Metric": "Company Information",
-            "Company A": f"{data['company_a']['name']} ({data['company_a']['industry']})",
-            "Company B": f"{data['company_b']['name']} ({data['company_b']['industry']})",
-            "Advantage": "N/A"
-        }
-        rows.append(basic_row)
-
-        # Feature comparisons
+            row = [
+                competitor["name"],
+                competitor["url"],
+                competitor["industry"],
+                report.get("market_position", ""),
+                "; ".join(report.get("strengths", [])),
+                "; ".join(report.get("weaknesses", [])),
+                "; ".join(report.get("key_differentiators", [])),
+                "; ".join(report.get("growth_opportunities", [])),
+                "; ".join(report.get("market_gaps", []))
+            ]
+
+            if include_pricing:
+                pricing = report.get("pricing_strategy") or {}
+                row.extend([
+                    pricing.get("model", ""),
+                    pricing.get("positioning", ""),
+                    pricing.get("transparency", "")
+                ])
+
+            yield row
+
+    def _comparison_csv_rows(self, data: Dict[str, Any]) -> Iterator[List[Any]]:
+        """Yield the company information row followed by one row per compared feature"""
+        yield [
+            "Company Information",
+            f"{data['company_a']['name']} ({data['company_a']['industry']})",
+            f"{data['company_b']['name']} ({data['company_b']['industry']})",
+            "N/A"
+        ]
+
         for feature in data.get("feature_comparison", []):
-            row = {
-                "Metric": feature["feature"],
-                "Company A": feature["company_a"],
-                "Company B": feature["company_b"],
-                "Advantage": feature["advantage"]
-            }
-            rows.append(row)
-
-        return pd.DataFrame(rows)
\ No newline at end of file
+            yield [
+                feature["feature"],
+                feature["company_a"],
+                feature["company_b"],
+                feature["advantage"]
+            ]
@@ -0,0 +1,307 @@
+from app.core.config import settings
+from app.core.database import get_connection
+from app.core.metrics import instrument_service
+from typing import Dict, Any, Iterator, List, Optional, Callable, Awaitable, Set, Tuple
+from datetime import datetime
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger("jobs")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# Rows loaded per query when iterating job history
+RESULT_PAGE_SIZE = 500
+
+class JobService:
+    """Background job queue that runs analyses and comparisons on a worker pool and persists results
+
+    Every app worker process runs its own pool against the shared jobs table. A job runs only in the
+    process that atomically claims it, and the claim is a lease renewed while the job runs, so jobs
+    left behind by a crashed process are picked up once the lease lapses.
+    """
+
+    def __init__(self, handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]]):
+        self.handlers = handlers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.workers: List[asyncio.Task] = []
+        # Identifies this process's claims on job leases
+        self.owner_id = str(uuid.uuid4())
+        # Ids waiting in the local queue, so recovery sweeps do not queue a job twice
+        self._queued: Set[str] = set()
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        """Create the jobs table on first use"""
+        with get_connection() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires_at REAL
+                )
+                """
+            )
+            # Tables created before leases existed lack the lease columns
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(jobs)").fetchall()}
+            for column, column_type in (("lease_owner", "TEXT"), ("lease_expires_at", "REAL")):
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    async def start(self):
+        """Start the worker pool and the sweep that recovers unclaimed and abandoned jobs"""
+        await self._recover()
+        for index in range(settings.JOB_WORKERS):
+            self.workers.append(asyncio.create_task(self._worker(index)))
+        self.workers.append(asyncio.create_task(self._recovery_loop()))
+
+    async def stop(self):
+        """Cancel the worker pool; running jobs are released for any worker to claim"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def submit(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Persist a new job and queue it for execution"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unsupported job type: {kind}")
+
+        job_id = str(uuid.uuid4())
+        job = await self._run_db(self._insert_job, job_id, kind, params)
+        self._enqueue(job_id)
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch a job's status and, once finished, its result"""
+        return await self._run_db(self._fetch_job, job_id)
+
+    def iter_results(
+        self,
+        kind: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield (job id, result) for completed jobs created in [since, until), oldest first, a page at a time"""
+        lower = self._format_bound(since) or ""
+        upper = self._format_bound(until)
+        cursor = (lower, "")
+
+        while True:
+            query = (
+                "SELECT id, created_at, result FROM jobs "
+                "WHERE kind = ? AND status = ? AND (created_at, id) > (?, ?)"
+            )
+            params: List[Any] = [kind, JOB_COMPLETED, cursor[0], cursor[1]]
+            if upper:
+                query += " AND created_at < ?"
+                params.append(upper)
+            query += " ORDER BY created_at, id LIMIT ?"
+            params.append(RESULT_PAGE_SIZE)
+
+            with get_connection() as connection:
+                rows = connection.execute(query, params).fetchall()
+
+            for job_id, _, result in rows:
+                if result:
+                    yield job_id, json.loads(result)
+
+            if len(rows) < RESULT_PAGE_SIZE:
+                return
+            cursor = (rows[-1][1], rows[-1][0])
+
+    def _format_bound(self, value: Optional[datetime]) -> Optional[str]:
+        """Match the naive local ISO timestamps stored in created_at"""
+        if value is None:
+            return None
+        if value.tzinfo is not None:
+            value = value.astimezone().replace(tzinfo=None)
+        return value.isoformat()
+
+    def _enqueue(self, job_id: str):
+        """Queue a job id locally unless it is already waiting"""
+        if job_id not in self._queued:
+            self._queued.add(job_id)
+            self.queue.put_nowait(job_id)
+
+    async def _recover(self):
+        """Queue jobs that are waiting for a worker or whose running lease has lapsed"""
+        claimable = await self._run_db(self._load_claimable_jobs)
+        recovered = [job_id for job_id in claimable if job_id not in self._queued]
+        for job_id in recovered:
+            self._enqueue(job_id)
+        if recovered:
+            logger.info(f"Queued {len(recovered)} unclaimed or abandoned jobs")
+
+    async def _recovery_loop(self):
+        """Periodically pick up jobs orphaned by a worker process that stopped or crashed"""
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS)
+            try:
+                await self._recover()
+            except Exception as e:
+                logger.error(f"Job recovery sweep failed: {str(e)}")
+
+    async def _worker(self, index: int):
+        """Pull job ids off the queue and execute them one at a time"""
+        while True:
+            job_id = await self.queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._execute(job_id)
+            except Exception as e:
+                logger.error(f"Worker {index} failed job {job_id}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    @instrument_service("jobs")
+    async def _execute(self, job_id: str):
+        """Claim a job, run it through its handler while renewing the lease, and persist the outcome"""
+        # Another process may have claimed the job already; only the claim that wins runs it
+        job = await self._run_db(self._claim_job, job_id)
+        if not job:
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await self.handlers[job["kind"]](job["params"])
+            if hasattr(result, "model_dump"):
+                result = result.model_dump(mode="json")
+            await self._run_db(self._finish_job, job_id, JOB_COMPLETED, result, None)
+            logger.info(f"Completed {job['kind']} job {job_id}")
+        except asyncio.CancelledError:
+            # Shutting down; hand the job back instead of waiting for the lease to lapse. The write
+            # runs off the event loop and is shielded so a second cancel cannot abandon it midway;
+            # stop() awaits the workers, so it finishes before shutdown. Missing it is harmless:
+            # the release only applies while we hold the lease, and a lapsed lease is recovered anyway.
+            try:
+                await asyncio.shield(self._run_db(self._release_job, job_id))
+            except Exception as e:
+                logger.warning(f"Failed to release job {job_id} on shutdown: {str(e)}")
+            raise
+        except Exception as e:
+            await self._run_db(self._finish_job, job_id, JOB_FAILED, None, str(e))
+            logger.error(f"{job['kind']} job {job_id} failed: {str(e)}")
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str):
+        """Renew a running job's lease until the job finishes"""
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            try:
+                renewed = await self._run_db(self._renew_lease, job_id)
+            except Exception as e:
+                logger.warning(f"Failed to renew lease for job {job_id}: {str(e)}")
+                continue
+            if not renewed:
+                logger.warning(f"Lost the lease on job {job_id}")
+                return
+
+    async def _run_db(self, func, *args):
+        """Run a blocking database call in the default executor"""
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    def _insert_job(self, job_id: str, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a queued job row"""
+        now = datetime.now().isoformat()
+        with get_connection() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, kind, status, params, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, JOB_QUEUED, json.dumps(params), now, now)
+            )
+        return self._fetch_job(job_id)
+
+    def _claim_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically mark a queued or abandoned job as running under this process's lease"""
+        now = time.time()
+        with get_connection() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires_at = ?, updated_at = ? "
+                "WHERE id = ? AND (status = ? OR (status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)))",
+                (
+                    JOB_RUNNING, self.owner_id, now + settings.JOB_LEASE_SECONDS, datetime.now().isoformat(),
+                    job_id, JOB_QUEUED, JOB_RUNNING, now
+                )
+            )
+            if cursor.rowcount != 1:
+                return None
+        return self._fetch_job(job_id)
+
+    def _renew_lease(self, job_id: str) -> bool:
+        """Extend the lease on a job this process is running; False once the lease was lost"""
+        with get_connection() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+                (time.time() + settings.JOB_LEASE_SECONDS, job_id, JOB_RUNNING, self.owner_id)
+            )
+            return cursor.rowcount == 1
+
+    def _release_job(self, job_id: str):
+        """Return a running job to the queue for any worker to claim"""
+        with get_connection() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (JOB_QUEUED, datetime.now().isoformat(), job_id, JOB_RUNNING, self.owner_id)
+            )
+
+    def _finish_job(self, job_id: str, status: str, result: Any, error: Optional[str]):
+        """Record a job's final status and outcome unless another process has taken the job over"""
+        with get_connection() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                "updated_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+                (
+                    status, json.dumps(result) if result is not None else None, error,
+                    datetime.now().isoformat(), job_id, JOB_RUNNING, self.owner_id
+                )
+            )
+        if cursor.rowcount != 1:
+            logger.warning(f"Discarded the outcome of job {job_id}; its lease was taken over by another worker")
+
+    def _fetch_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Load a job row as a dict"""
+        with get_connection() as connection:
+            row = connection.execute(
+                "SELECT id, kind, status, params, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            "job_id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "params": json.loads(row[3]),
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7]
+        }
+
+    def _load_claimable_jobs(self) -> List[str]:
+        """List queued jobs and running jobs whose lease has lapsed"""
+        with get_connection() as connection:
+            rows = connection.execute(
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)) "
+                "ORDER BY created_at",
+                (JOB_QUEUED, JOB_RUNNING, time.time())
+            ).fetchall()
+        return [row[0] for row in rows]
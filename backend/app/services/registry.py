@@ -0,0 +1,108 @@
+from app.agents import FirecrawlAgent, AnalysisAgent, ComparisonAgent
+from .discovery_service import DiscoveryService
+from .analysis_service import AnalysisService
+from .comparison_service import ComparisonService
+from .export_service import ExportService
+from .job_service import JobService
+from app.core.resilience import shutdown_provider_executor
+from typing import Any, Callable, Dict
+import logging
+import threading
+
+logger = logging.getLogger("services")
+
+class ServiceRegistry:
+    """Application-scoped holder that builds each agent and service once and shares it"""
+
+    def __init__(self):
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], Any]) -> Any:
+        """Return the shared instance, constructing it on first use"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = factory()
+                logger.info(f"Initialized shared {name}")
+            return self._instances[name]
+
+    def firecrawl_agent(self) -> FirecrawlAgent:
+        """Shared firecrawl agent instance"""
+        return self._get_or_create("firecrawl_agent", FirecrawlAgent)
+
+    def analysis_agent(self) -> AnalysisAgent:
+        """Shared analysis agent instance"""
+        return self._get_or_create("analysis_agent", AnalysisAgent)
+
+    def comparison_agent(self) -> ComparisonAgent:
+        """Shared comparison agent instance"""
+        return self._get_or_create("comparison_agent", ComparisonAgent)
+
+    def discovery_service(self) -> DiscoveryService:
+        """Shared discovery service instance"""
+        return self._get_or_create("discovery_service", DiscoveryService)
+
+    def analysis_service(self) -> AnalysisService:
+        """Shared analysis service instance"""
+        return self._get_or_create("analysis_service", lambda: AnalysisService(
+            firecrawl_agent=self.firecrawl_agent(),
+            analysis_agent=self.analysis_agent()
+        ))
+
+    def comparison_service(self) -> ComparisonService:
+        """Shared comparison service instance"""
+        return self._get_or_create("comparison_service", lambda: ComparisonService(
+            firecrawl_agent=self.firecrawl_agent(),
+            comparison_agent=self.comparison_agent(),
+            analysis_service=self.analysis_service()
+        ))
+
+    def export_service(self) -> ExportService:
+        """Shared export service instance"""
+        return self._get_or_create("export_service", ExportService)
+
+    def job_service(self) -> JobService:
+        """Shared background job service instance"""
+        return self._get_or_create("job_service", lambda: JobService({
+            "analysis": self._run_analysis_job,
+            "comparison": self._run_comparison_job
+        }))
+
+    async def _run_analysis_job(self, params: Dict[str, Any]):
+        """Job handler for queued competitor analyses"""
+        return await self.analysis_service().analyze_competitors(
+            params["competitor_urls"],
+            bypass_cache=params.get("bypass_cache", False)
+        )
+
+    async def _run_comparison_job(self, params: Dict[str, Any]):
+        """Job handler for queued two-company comparisons"""
+        return await self.comparison_service().compare_competitors(
+            params["company_a_url"],
+            params["company_b_url"],
+            bypass_cache=params.get("bypass_cache", False)
+        )
+
+    def shutdown(self):
+        """Release worker pools held by shared services"""
+        export_service = self._instances.get("export_service")
+        if export_service is not None:
+            export_service.shutdown()
+        shutdown_provider_executor()
+
+    def warm_up(self):
+        """Eagerly build every service; missing API keys are reported on first use instead"""
+        for factory in (
+            self.discovery_service,
+            self.analysis_service,
+            self.comparison_service,
+            self.export_service
+        ):
+            try:
+                factory()
+            except Exception as e:
+                logger.warning(f"Deferred service initialization: {str(e)}")
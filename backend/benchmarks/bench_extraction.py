@@ -0,0 +1,160 @@
+"""Micro-benchmark for crawl structured-data extraction
+
+Compares FirecrawlAgent._extract_structured_data with the line-by-line implementation
+it replaced: first checks that both produce identical output on randomly generated
+pages, then times both on large keyword-dense and keyword-sparse pages.
+
+Run from the backend directory:
+
+    python benchmarks/bench_extraction.py
+"""
+from typing import Any, Callable, Dict, List
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.firecrawl_agent import FirecrawlAgent
+
+# Every section keyword plus case and Unicode edge cases (İ and Σ change length or form when lowercased)
+KEYWORD_WORDS = (
+    "about us company industry sector founded established products services solutions offerings "
+    "pricing price cost $ € £ subscription monthly one-time purchase freemium free trial phone tel call "
+    "address location @ . hotel Email İstanbul ΑΣ ABOUT PRICING"
+).split()
+FILLER_WORDS = (
+    "our platform helps teams ship faster with reliable tooling and great support for developers worldwide"
+).split()
+
+def reference_extract(scrape_result: Dict[str, Any]) -> Dict[str, Any]:
+    """The previous implementation: four lowercase/split passes with per-line any() checks"""
+    content = scrape_result.get("markdown", "")
+    metadata = scrape_result.get("metadata", {})
+
+    return {
+        "title": metadata.get("title", ""),
+        "description": metadata.get("description", ""),
+        "keywords": metadata.get("keywords", []),
+        "company_info": _reference_company_info(content),
+        "products_services": _reference_products_services(content),
+        "pricing_info": _reference_pricing_info(content),
+        "contact_info": _reference_contact_info(content)
+    }
+
+def _reference_company_info(content: str) -> Dict[str, Any]:
+    lines = content.lower().split('\n')
+    company_info = {"about": "", "industry": "", "size": "", "founded": ""}
+
+    for line in lines:
+        if any(keyword in line for keyword in ["about us", "about", "company"]):
+            company_info["about"] = line.strip()
+        elif any(keyword in line for keyword in ["industry", "sector"]):
+            company_info["industry"] = line.strip()
+        elif any(keyword in line for keyword in ["founded", "established"]):
+            company_info["founded"] = line.strip()
+
+    return company_info
+
+def _reference_products_services(content: str) -> List[str]:
+    products = []
+    lines = content.lower().split('\n')
+
+    for line in lines:
+        if any(keyword in line for keyword in ["products", "services", "solutions", "offerings"]):
+            products.append(line.strip())
+
+    return products[:10]
+
+def _reference_pricing_info(content: str) -> Dict[str, Any]:
+    pricing = {"has_pricing": False, "pricing_model": "", "plans": []}
+
+    content_lower = content.lower()
+    if any(keyword in content_lower for keyword in ["pricing", "price", "cost", "$", "€", "£"]):
+        pricing["has_pricing"] = True
+
+        if "subscription" in content_lower or "monthly" in content_lower:
+            pricing["pricing_model"] = "subscription"
+        elif "one-time" in content_lower or "purchase" in content_lower:
+            pricing["pricing_model"] = "one-time"
+        elif "freemium" in content_lower or "free trial" in content_lower:
+            pricing["pricing_model"] = "freemium"
+
+    return pricing
+
+def _reference_contact_info(content: str) -> Dict[str, Any]:
+    contact = {"email": "", "phone": "", "address": ""}
+
+    lines = content.split('\n')
+    for line in lines:
+        if "@" in line and "." in line:
+            contact["email"] = line.strip()
+        elif any(keyword in line.lower() for keyword in ["phone", "tel", "call"]):
+            contact["phone"] = line.strip()
+        elif any(keyword in line.lower() for keyword in ["address", "location"]):
+            contact["address"] = line.strip()
+
+    return contact
+
+def dense_page(rng: random.Random, lines: int) -> str:
+    """Page where most lines hit at least one keyword"""
+    vocabulary = KEYWORD_WORDS + ["lorem"] * 30
+    return "\n".join(
+        " ".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 15)))
+        for _ in range(lines)
+    )
+
+def sparse_page(rng: random.Random, lines: int) -> str:
+    """Marketing-style page where about 3% of words are keywords"""
+    return "\n".join(
+        " ".join(
+            rng.choice(KEYWORD_WORDS) if rng.random() < 0.03 else rng.choice(FILLER_WORDS)
+            for _ in range(rng.randint(3, 20))
+        )
+        for _ in range(lines)
+    )
+
+def check_equivalence(current: Callable[[Dict[str, Any]], Dict[str, Any]], pages: int, seed: int):
+    """Fail on the first random page where the two implementations disagree"""
+    rng = random.Random(seed)
+    for index in range(pages):
+        page = dense_page(rng, rng.randint(0, 40)) if index % 2 else sparse_page(rng, rng.randint(0, 300))
+        scrape_result = {"markdown": page, "metadata": {"title": "Example", "description": "Example page"}}
+        expected = reference_extract(scrape_result)
+        actual = current(scrape_result)
+        if actual != expected:
+            raise AssertionError(f"Output differs on page {index}:\n{page}\nexpected {expected}\nactual {actual}")
+
+def time_call(func: Callable[[Dict[str, Any]], Dict[str, Any]], scrape_result: Dict[str, Any], repeat: int) -> float:
+    """Best-of-repeat milliseconds per call"""
+    return min(timeit.repeat(lambda: func(scrape_result), number=5, repeat=repeat)) / 5 * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=3000, help="random pages to check for identical output")
+    parser.add_argument("--lines", type=int, default=5000, help="lines per page in the timing runs")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions; the best is reported")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Extraction needs no client, so skip the constructor and its API key check
+    agent = FirecrawlAgent.__new__(FirecrawlAgent)
+    current = agent._extract_structured_data
+
+    check_equivalence(current, args.pages, args.seed)
+    print(f"Identical output on {args.pages} random pages")
+
+    rng = random.Random(args.seed)
+    for label, page in (
+        ("keyword-dense", dense_page(rng, args.lines)),
+        ("keyword-sparse", sparse_page(rng, args.lines))
+    ):
+        scrape_result = {"markdown": page, "metadata": {}}
+        before = time_call(reference_extract, scrape_result, args.repeat)
+        after = time_call(current, scrape_result, args.repeat)
+        print(f"{label} {args.lines}-line page: {before:.1f} ms -> {after:.1f} ms ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+from app.agents import AnalysisAgent, CrawlResult, FirecrawlAgent
+from app.core.config import settings
+from app.services.analysis_service import AnalysisService
+
+ANALYSIS = {
+    "industry": "Software",
+    "strengths": [],
+    "weaknesses": [],
+    "pricing_strategy": {},
+    "market_position": "challenger",
+    "key_differentiators": [],
+    "growth_opportunities": [],
+    "market_gaps": []
+}
+
+def make_service(monkeypatch, tmp_path) -> AnalysisService:
+    """Analysis service whose crawls and Gemini calls are faked, with one competitor's call never returning"""
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(settings, "FIRECRAWL_API_KEY", "test")
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(settings, "CRAWL_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "ANALYSIS_TIMEOUT", 1)
+    monkeypatch.setattr(settings, "ANALYSIS_BATCH_SIZE", 4)
+    monkeypatch.setattr(settings, "RETRY_MAX_ATTEMPTS", 1)
+
+    firecrawl_agent = FirecrawlAgent()
+    analysis_agent = AnalysisAgent()
+
+    async def crawl_url(url, formats=None, bypass_cache=False):
+        # Large pages so every competitor gets its own prompt within the one analysis group
+        return CrawlResult(url=url, success=True, content="pricing plans " * 5000, structured_data={"title": url})
+
+    async def generate_content_async(prompt):
+        url = re.search(r"https://\S+?\.com", prompt).group(0)
+        if "hangs" in url:
+            await asyncio.Event().wait()
+        return SimpleNamespace(text=json.dumps(dict(ANALYSIS, company_name=url)))
+
+    monkeypatch.setattr(firecrawl_agent, "crawl_url", crawl_url)
+    monkeypatch.setattr(analysis_agent, "model", SimpleNamespace(generate_content_async=generate_content_async))
+    return AnalysisService(firecrawl_agent=firecrawl_agent, analysis_agent=analysis_agent)
+
+def test_finished_reports_survive_the_deadline(monkeypatch, tmp_path):
+    service = make_service(monkeypatch, tmp_path)
+    urls = ["https://a.com", "https://b.com", "https://hangs.com", "https://c.com"]
+
+    response = asyncio.run(service.analyze_competitors(urls))
+
+    assert response.partial
+    assert sorted(report.competitor.url for report in response.reports) == ["https://a.com", "https://b.com", "https://c.com"]
@@ -46,11 +46,40 @@ const Dashboard = () => {
     }
 
     setIsAnalyzing(true);
+    setAnalysisResults({ reports: [], summary: '', timestamp: null });
+    // Tally outcomes so the final toast reflects failed competitors and deadline cut-offs
+    const outcome = { reports: 0, failed: 0, partial: false, error: null };
     try {
-      const results = await competitorAPI.analyzeCompetitors(selectedCompetitors);
-      setAnalysisResults(results);
-      setShowAnalysis(true);
-      toast.success('Analysis completed successfully!');
+      // Render each competitor report as soon as the backend finishes it
+      await competitorAPI.analyzeCompetitorsStream(selectedCompetitors, (event) => {
+        if (event.type === 'report') {
+          outcome.reports += 1;
+          setAnalysisResults((prev) => ({ ...prev, reports: [...prev.reports, event.data] }));
+          setShowAnalysis(true);
+        } else if (event.type === 'summary') {
+          outcome.partial = Boolean(event.partial);
+          setAnalysisResults((prev) => ({ ...prev, summary: event.data, timestamp: event.timestamp }));
+        } else if (event.type === 'error') {
+          if (event.url) {
+            outcome.failed += 1;
+            console.error('Competitor analysis failed:', event.url, event.error);
+          } else {
+            // An error without a url means the whole stream failed
+            outcome.error = event.error;
+            console.error('Analysis failed:', event.error);
+          }
+        }
+      });
+
+      if (outcome.error || outcome.reports === 0) {
+        toast.error('Analysis failed. Please try again.');
+      } else if (outcome.partial || outcome.failed > 0) {
+        setShowAnalysis(true);
+        toast(`Analysis partially completed: ${outcome.reports} of ${selectedCompetitors.length} competitors analyzed`, { icon: '⚠️' });
+      } else {
+        setShowAnalysis(true);
+        toast.success('Analysis completed successfully!');
+      }
     } catch (error) {
       console.error('Analysis failed:', error);
       toast.error('Analysis failed. Please try again.');
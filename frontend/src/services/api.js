@@ -39,6 +39,40 @@ export const competitorAPI = {
     return response.data;
   },
 
+  // Analyze competitors, receiving each report as soon as it is ready
+  analyzeCompetitorsStream: async (competitorUrls, onEvent) => {
+    const response = await fetch(`${API_BASE_URL}/api/v1/analyze/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(competitorUrls),
+    });
+
+    if (!response.ok || !response.body) {
+      const message = `Analysis failed with status ${response.status}`;
+      toast.error(message);
+      throw new Error(message);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+
+      lines.filter((line) => line.trim()).forEach((line) => onEvent(JSON.parse(line)));
+    }
+
+    if (buffer.trim()) {
+      onEvent(JSON.parse(buffer));
+    }
+  },
+
   // Compare competitors
   compareCompetitors: async (companyAUrl, companyBUrl) => {
     const response = await api.post('/compare', {